@@ -0,0 +1,53 @@
+# Simulation core of the AI Evacuation System. Submodules are only loaded on first attribute
+# access, and the optional dependencies (NumPy, pygame, OpenCV) are imported inside the
+# functions that use them, so importing any module stays free: worker processes can import
+# the package cheaply and pay only for what they use. Nothing here imports PyQt6.
+import importlib
+
+_EXPORTS = {
+    'ExitDoor': 'simulation',
+    'EntryPoint': 'simulation',
+    'Map': 'simulation',
+    'Fire': 'simulation',
+    'FireState': 'fire',
+    'Agent': 'simulation',
+    'Simulation': 'simulation',
+    'Tick': 'simulation',
+    'TickPipeline': 'pipeline',
+    'Path': 'paths',
+    'TiledSimulation': 'tiles',
+    'astar': 'simulation',
+    'calculate_astar': 'simulation',
+    'spawn_agents': 'simulation',
+    'FreeCellIndex': 'spawning',
+    'room_density': 'spawning',
+    'SimulationClock': 'clock',
+    'ReplanScheduler': 'scheduler',
+    'RoutingTable': 'routing',
+    'MapWatcher': 'map_watch',
+    'SensorFeed': 'sensors',
+    'ConnectivityIndex': 'connectivity',
+    'ExitAssigner': 'exit_assignment',
+    'CooperativePlanner': 'cooperative',
+    'fire_arrival_times': 'fire_arrival',
+    'HazardField': 'hazard',
+    'open_sink': 'trajectory',
+    'export': 'trajectory',
+    'TrajectoryStore': 'trajectory',
+    'SimulationService': 'service',
+    'FrameRenderer': 'render',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,67 @@
+import time
+
+TICK_MS = 100
+FRAME_MS = 1000 / 60
+
+
+class SimulationClock:
+    # Fixed-timestep clock: the simulation advances in whole ticks of tick_ms simulated time,
+    # independent of how often frames are drawn. speed=None runs ticks as fast as the CPU allows
+    # and only stops to draw a frame every frame_ms of wall time.
+    def __init__(self, tick_ms=TICK_MS, speed=1.0, frame_ms=FRAME_MS, max_ticks_per_frame=20):
+        self.tick_seconds = tick_ms / 1000
+        self.frame_seconds = frame_ms / 1000
+        self.speed = speed
+        self.max_ticks_per_frame = max_ticks_per_frame
+        self.accumulator = 0.0
+        self.last_time = time.perf_counter()
+        self.frame_start = self.last_time
+        self.ticks = 0
+
+    @property
+    def fast_forward(self):
+        return self.speed is None
+
+    def set_speed(self, speed):
+        self.speed = speed
+        self.accumulator = 0.0
+        self.last_time = time.perf_counter()
+
+    def due_ticks(self):
+        now = time.perf_counter()
+        self.frame_start = now
+
+        if self.fast_forward:
+            self.last_time = now
+            # Keep stepping until this frame's wall-time budget is spent, then let the viewer draw
+            while True:
+                self.ticks += 1
+                yield self.ticks
+                if time.perf_counter() - self.frame_start >= self.frame_seconds:
+                    return
+
+        self.accumulator += (now - self.last_time) * self.speed
+        self.last_time = now
+        due = int(self.accumulator // self.tick_seconds)
+        if due > self.max_ticks_per_frame:
+            # Too far behind (slow machine or a stall): drop the backlog instead of spiralling
+            due = self.max_ticks_per_frame
+            self.accumulator = due * self.tick_seconds
+        for _ in range(due):
+            self.accumulator -= self.tick_seconds
+            self.ticks += 1
+            yield self.ticks
+
+    @property
+    def alpha(self):
+        # Fraction of the next tick already elapsed, used to interpolate agent positions
+        if self.fast_forward:
+            return 1.0
+        return min(self.accumulator / self.tick_seconds, 1.0)
+
+    def wait_for_frame(self):
+        if self.fast_forward:
+            return
+        remaining = self.frame_seconds - (time.perf_counter() - self.frame_start)
+        if remaining > 0:
+            time.sleep(remaining)
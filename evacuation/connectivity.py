@@ -0,0 +1,117 @@
+from array import array
+
+from .routing import UNREACHABLE, blocked_cells, cell_index, neighbors
+
+
+class ConnectivityIndex:
+    # Connected-component label for every free cell of a Map, plus the set of labels that
+    # contain an exit. Whether an agent can reach any exit, or one particular exit, is then a
+    # label lookup instead of an A* search that floods the whole enclosed region to find out.
+    def __init__(self, game_map):
+        self.game_map = game_map
+        self.cols = game_map.cols
+        self.rows = game_map.rows
+        self.blocked = blocked_cells(game_map)
+        self.labels = array('i', [UNREACHABLE]) * (self.cols * self.rows)
+        self.next_label = 0
+        for cell in range(self.cols * self.rows):
+            if not self.blocked[cell] and self.labels[cell] == UNREACHABLE:
+                self._flood(cell, UNREACHABLE)
+        self._update_exits()
+
+    def _new_label(self):
+        self.next_label += 1
+        return self.next_label - 1
+
+    def _flood(self, start, old_label, label=None):
+        # Relabels the region of old_label cells connected to start
+        if label is None:
+            label = self._new_label()
+        labels, blocked, cols, rows = self.labels, self.blocked, self.cols, self.rows
+        labels[start] = label
+        stack = [start]
+        while stack:
+            cell = stack.pop()
+            for neighbor in neighbors(cell, cols, rows):
+                if labels[neighbor] == old_label and not blocked[neighbor]:
+                    labels[neighbor] = label
+                    stack.append(neighbor)
+        return label
+
+    def _update_exits(self):
+        game_map = self.game_map
+        self.exit_labels = [self.labels[cell_index(game_map, door.x, door.y)] for door in game_map.exit_doors]
+        self.reachable_labels = set(self.exit_labels) - {UNREACHABLE}
+
+    def label(self, x, y):
+        cell = cell_index(self.game_map, x, y)
+        if not self.blocked[cell]:
+            return self.labels[cell]
+        # A wall dropped on an agent's cell: it can still step off into a free neighbour
+        for neighbor in neighbors(cell, self.cols, self.rows):
+            if self.labels[neighbor] in self.reachable_labels:
+                return self.labels[neighbor]
+        return UNREACHABLE
+
+    def can_exit(self, x, y):
+        return self.label(x, y) in self.reachable_labels
+
+    def reachable_exits(self, x, y):
+        label = self.label(x, y)
+        if label == UNREACHABLE:
+            return []
+        return [door for door, exit_label in zip(self.game_map.exit_doors, self.exit_labels) if exit_label == label]
+
+    def _splits(self, cell):
+        # Whether walling cell can split its component: not if its free orthogonal neighbours are
+        # still joined to each other inside the ring of eight cells around it
+        cols, rows, blocked = self.cols, self.rows, self.blocked
+        row, col = divmod(cell, cols)
+        ring = set()
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                r, c = row + dy, col + dx
+                if (dx or dy) and 0 <= r < rows and 0 <= c < cols and not blocked[r * cols + c]:
+                    ring.add((r, c))
+        sides = [(r, c) for r, c in ring if abs(r - row) + abs(c - col) == 1]
+        if len(sides) < 2:
+            return False
+        seen = {sides[0]}
+        stack = [sides[0]]
+        while stack:
+            r, c = stack.pop()
+            for neighbor in ((r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)):
+                if neighbor in ring and neighbor not in seen:
+                    seen.add(neighbor)
+                    stack.append(neighbor)
+        return not all(side in seen for side in sides)
+
+    def add_wall(self, x, y):
+        # The wall may split its component; each side that is left gets relabelled
+        cell = cell_index(self.game_map, x, y)
+        if self.blocked[cell]:
+            return
+        old_label = self.labels[cell]
+        self.blocked[cell] = 1
+        self.labels[cell] = UNREACHABLE
+        if self._splits(cell):
+            for neighbor in neighbors(cell, self.cols, self.rows):
+                if self.labels[neighbor] == old_label and not self.blocked[neighbor]:
+                    self._flood(neighbor, old_label)
+        self._update_exits()
+
+    def remove_wall(self, x, y):
+        # The opened cell joins the components around it; all but the first are relabelled to match
+        cell = cell_index(self.game_map, x, y)
+        if not self.blocked[cell]:
+            return
+        self.blocked[cell] = 0
+        around = [self.labels[neighbor] for neighbor in neighbors(cell, self.cols, self.rows)]
+        around = [label for label in around if label != UNREACHABLE]
+        label = around[0] if around else self._new_label()
+        self.labels[cell] = label
+        for neighbor in neighbors(cell, self.cols, self.rows):
+            old_label = self.labels[neighbor]
+            if old_label not in (UNREACHABLE, label):
+                self._flood(neighbor, old_label, label)
+        self._update_exits()
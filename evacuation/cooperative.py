@@ -0,0 +1,169 @@
+import heapq
+import itertools
+
+from .paths import Path
+from .costs import IMPASSABLE, default_layers
+from .routing import UNREACHABLE, cell_index
+from .exit_assignment import ExitDistanceFields
+
+COOPERATIVE_WINDOW = 10
+
+
+class ReservationTable:
+    # Space-time cells claimed by planned agents: (position, move) for where an agent stands and
+    # (from, to, move) for the step it takes, so two agents can neither meet nor swap places
+    def __init__(self):
+        self.cells = {}
+        self.edges = {}
+        self.claims = {}
+
+    def reserve(self, agent, start, path, now):
+        claims = self.claims.setdefault(agent, [])
+        previous = start
+        for step, position in enumerate(path, now + 1):
+            self.cells[(position, step)] = agent
+            self.edges[(previous, position, step)] = agent
+            claims.append((position, previous, step))
+            previous = position
+
+    def holders(self, position, steps):
+        return {self.cells[(position, step)] for step in steps if (position, step) in self.cells}
+
+    def release(self, agent):
+        for position, previous, step in self.claims.pop(agent, ()):
+            if self.cells.get((position, step)) is agent:
+                del self.cells[(position, step)]
+            if self.edges.get((previous, position, step)) is agent:
+                del self.edges[(previous, position, step)]
+
+    def blocked(self, agent, position, next_position, step):
+        holder = self.cells.get((next_position, step))
+        if holder is not None and holder is not agent:
+            return True
+        # Swapping through each other: someone else takes next_position -> position at the same step
+        holder = self.edges.get((next_position, position, step))
+        return holder is not None and holder is not agent and position != next_position
+
+
+class CooperativePlanner:
+    # Windowed hierarchical cooperative A* (WHCA*). Each agent searches (position, move) space
+    # around the reservations of the agents planned before it, but only `window` moves deep;
+    # past the window it is costed by the true distance to its exit from a per-exit BFS field,
+    # which ignores other agents. Agents re-plan on a rolling schedule, a slice per tick, so
+    # every agent gets a fresh window well before it runs out of the old one.
+    def __init__(self, game_map, window=COOPERATIVE_WINDOW, fields=None, ticks_per_move=1):
+        self.game_map = game_map
+        self.window = window
+        self.reservations = ReservationTable()
+        # The exit assigner's fields can be shared when it runs too
+        if fields is None:
+            fields = ExitDistanceFields(game_map)
+            game_map.wall_listeners.append(fields)
+        self.fields = fields
+        # Steps are priced with the same cost layers as astar: fire, the fire arrival times
+        # (ticks from now, kept current by the simulation) and an optional HazardField
+        self.arrival = None
+        self.hazard = None
+        self.ticks_per_move = ticks_per_move
+        # Fixed slot per agent in the rolling schedule, handed out in planning order
+        self.slots = {}
+        # Agents whose reservations a boxed-in agent had to override; they re-plan in the same pass
+        self.bumped = []
+        self.expanded = 0
+
+    def scheduled(self, agents, tick):
+        # Agents spaced over half a window of ticks, so no path is consumed before its refresh
+        interval = max(1, self.window // 2)
+        slots = self.slots
+        return [agent for agent in agents if agent in slots and (slots[agent] + tick) % interval == 0]
+
+    def release(self, agent):
+        self.reservations.release(agent)
+
+    def forget(self, agent):
+        self.reservations.release(agent)
+        self.slots.pop(agent, None)
+
+    def goal(self, agent):
+        # The assigned exit when it can be reached, otherwise the nearest one
+        self.fields.refresh()
+        cell = cell_index(self.game_map, agent.x, agent.y)
+        doors = self.game_map.exit_doors
+        reachable = [(field[cell], i) for i, field in enumerate(self.fields.fields) if field[cell] != UNREACHABLE]
+        if not reachable:
+            return None
+        for distance, i in reachable:
+            if doors[i] is agent.target_exit:
+                return i
+        return min(reachable)[1]
+
+    def plan(self, agent, now):
+        self.reservations.release(agent)
+        self.slots.setdefault(agent, len(self.slots))
+        exit_id = self.goal(agent)
+        if exit_id is None:
+            return Path.empty(self.game_map.cols, self.game_map.grid_size)
+        # Like calculate_astar: around the fire if possible, through it only when there is no other way
+        path = self.search(agent, now, exit_id, True) or self.search(agent, now, exit_id, False)
+        if not path:
+            # Boxed in by other reservations: hold the cell and send whoever planned through it back
+            path = [(agent.x, agent.y)] * self.window
+            self.bumped.extend(self.reservations.holders(path[0], range(now + 1, now + self.window + 1)))
+        self.reservations.reserve(agent, (agent.x, agent.y), path, now)
+        return Path.from_positions(path, self.game_map.cols, self.game_map.grid_size)
+
+    def search(self, agent, now, exit_id, avoid_fire=True):
+        game_map = self.game_map
+        grid_size, walls, fires = game_map.grid_size, game_map.walls, game_map.fire_positions
+        layers = default_layers(fires, avoid_fire, self.arrival, self.hazard, self.ticks_per_move)
+        field = self.fields.fields[exit_id]
+        door = game_map.exit_doors[exit_id]
+        goal = (door.x, door.y)
+        start = (agent.x, agent.y)
+        moves = [(0, 0), (0, -grid_size), (0, grid_size), (-grid_size, 0), (grid_size, 0)]
+
+        def heuristic(position):
+            return field[cell_index(game_map, *position)]
+
+        # Entries are (f, tie, depth, position, terminal); a terminal entry closes the window
+        counter = itertools.count()
+        open_list = [(heuristic(start), next(counter), 0, start, False)]
+        g_score = {(start, 0): 0}
+        came_from = {}
+        while open_list:
+            _, _, depth, current, terminal = heapq.heappop(open_list)
+            if terminal or current == goal:
+                path = []
+                state = (current, depth)
+                while state in came_from:
+                    path.append(state[0])
+                    state = came_from[state]
+                path.reverse()
+                return path
+            self.expanded += 1
+            g = g_score[(current, depth)]
+            if depth == self.window:
+                heapq.heappush(open_list, (g + heuristic(current), next(counter), depth, current, True))
+                continue
+
+            for dx, dy in moves:
+                neighbor = (current[0] + dx, current[1] + dy)
+                if not game_map.in_bounds(*neighbor) or neighbor in walls:
+                    continue
+                if heuristic(neighbor) == UNREACHABLE:
+                    continue
+                if self.reservations.blocked(agent, current, neighbor, now + depth + 1):
+                    continue
+                cost = 1
+                for layer in layers:
+                    cost += layer.cost(neighbor, depth + 1)
+                if cost == IMPASSABLE:
+                    continue
+                tentative = g + cost
+                state = (neighbor, depth + 1)
+                if tentative < g_score.get(state, float('inf')):
+                    g_score[state] = tentative
+                    came_from[state] = (current, depth)
+                    heapq.heappush(open_list, (tentative + heuristic(neighbor), next(counter), depth + 1,
+                                               neighbor, False))
+        return []
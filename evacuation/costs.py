@@ -0,0 +1,74 @@
+import math
+
+from .routing import UNREACHABLE, cell_index
+
+FIRE_PENALTY = 10
+LATE_ARRIVAL_PENALTY = 5
+IMPASSABLE = math.inf
+
+# A cost layer has cost(position, step) -> extra cost (>= 0) of entering position as the step-th
+# move of the route, or IMPASSABLE. Every move costs 1 plus the sum of the layers, so any
+# heuristic that never overestimates the number of remaining moves stays admissible.
+# A heuristic is called as heuristic(position, goal) and returns that lower bound.
+
+
+class FireCost:
+    def __init__(self, fires, avoid=True, penalty=FIRE_PENALTY):
+        self.fires = fires
+        self.avoid = avoid
+        self.penalty = penalty
+
+    def cost(self, position, step):
+        if position in self.fires:
+            return IMPASSABLE if self.avoid else self.penalty
+        return 0
+
+
+class ArrivalCost:
+    # Cells the fire is expected to reach before the agent does are discouraged. Arrival is in
+    # ticks and step counts moves, one every ticks_per_move ticks.
+    def __init__(self, arrival, penalty=LATE_ARRIVAL_PENALTY, ticks_per_move=1):
+        self.arrival = arrival
+        self.penalty = penalty
+        self.ticks_per_move = ticks_per_move
+
+    def cost(self, position, step):
+        return self.penalty if self.arrival.get(position, math.inf) <= step * self.ticks_per_move else 0
+
+
+def default_layers(fires, avoid_fire=True, arrival=None, hazard=None, ticks_per_move=1):
+    layers = [FireCost(fires, avoid_fire)]
+    if arrival is not None:
+        layers.append(ArrivalCost(arrival, ticks_per_move=ticks_per_move))
+    if hazard is not None:
+        layers.append(hazard)
+    return layers
+
+
+class ManhattanHeuristic:
+    # Exact move count on an empty 4-connected grid, so admissible and consistent
+    def __init__(self, grid_size):
+        self.grid_size = grid_size
+
+    def __call__(self, position, goal):
+        return (abs(position[0] - goal[0]) + abs(position[1] - goal[1])) // self.grid_size
+
+
+class EuclideanHeuristic:
+    def __init__(self, grid_size):
+        self.grid_size = grid_size
+
+    def __call__(self, position, goal):
+        return math.hypot(position[0] - goal[0], position[1] - goal[1]) / self.grid_size
+
+
+class FieldHeuristic:
+    # Moves to the goal around the walls, read from a BFS distance field rooted at the goal (see
+    # ExitDistanceFields). Exact when no layer adds cost, so the search walks almost straight there.
+    def __init__(self, game_map, field):
+        self.game_map = game_map
+        self.field = field
+
+    def __call__(self, position, goal):
+        distance = self.field[cell_index(self.game_map, *position)]
+        return IMPASSABLE if distance == UNREACHABLE else distance
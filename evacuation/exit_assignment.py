@@ -0,0 +1,156 @@
+import heapq
+import math
+
+from .routing import UNREACHABLE, blocked_cells, cell_index, distance_field
+
+EXIT_THROUGHPUT = 1
+ASSIGNMENT_INTERVAL = 5
+AUCTION_EPSILON = 0.5
+
+
+class ExitDistanceFields:
+    # One BFS distance field per exit, shared by every agent and rebuilt lazily after wall edits
+    def __init__(self, game_map):
+        self.game_map = game_map
+        self.fields = []
+        self.dirty = True
+
+    def add_wall(self, x, y):
+        self.dirty = True
+
+    def remove_wall(self, x, y):
+        self.dirty = True
+
+    def refresh(self):
+        if not self.dirty:
+            return
+        game_map = self.game_map
+        blocked = blocked_cells(game_map)
+        self.fields = [
+            distance_field(blocked, game_map.cols, game_map.rows, [cell_index(game_map, door.x, door.y)])[0]
+            for door in game_map.exit_doors
+        ]
+        self.dirty = False
+
+    def distances(self, agent):
+        cell = cell_index(self.game_map, agent.x, agent.y)
+        return [field[cell] for field in self.fields]
+
+
+class ExitAssigner:
+    # Auction for a transportation problem: agents bid for exit slots, each exit holds at most
+    # throughput * horizon agents and the lowest held bid is its price. Agents that cannot get a
+    # slot without paying more than overflow_penalty fall back to their nearest exit, which
+    # keeps prices bounded even when an exit is the only way out for more agents than it fits.
+    def __init__(self, game_map, throughput=None, horizon=None, epsilon=AUCTION_EPSILON, overflow_penalty=None):
+        self.game_map = game_map
+        self.fields = ExitDistanceFields(game_map)
+        game_map.wall_listeners.append(self.fields)
+        count = len(game_map.exit_doors)
+        self.throughput = list(throughput) if throughput is not None else [EXIT_THROUGHPUT] * count
+        self.horizon = horizon
+        self.epsilon = epsilon
+        self.overflow_penalty = overflow_penalty
+        self.held = [[] for _ in range(count)]
+        self.assignment = {}
+        self.capacity = None
+        self.horizon_used = None
+        self.bids = 0
+
+    def capacities(self, num_agents):
+        horizon = self.horizon or max(1, math.ceil(num_agents / max(sum(self.throughput), 1)))
+        return [max(1, int(rate * horizon)) for rate in self.throughput], horizon
+
+    def price(self, exit_index, capacity):
+        held = self.held[exit_index]
+        return held[0][0] if len(held) >= capacity[exit_index] else 0.0
+
+    def update(self, agents):
+        self.fields.refresh()
+        # Capacities stay fixed between re-solves while they still fit, so agents leaving only free
+        # slots. Shrinking them would evict holders at the old, inflated prices and start a long
+        # bidding war; instead a population that outgrows them or halves gets a cold solve.
+        capacity, horizon = self.capacities(len(agents))
+        if self.capacity is None or any(new > old for new, old in zip(capacity, self.capacity)) or \
+                sum(capacity) * 2 <= sum(self.capacity):
+            if capacity != self.capacity:
+                self.held = [[] for _ in self.held]
+                self.assignment = {}
+            self.capacity, self.horizon_used = capacity, horizon
+        capacity, horizon = self.capacity, self.horizon_used
+        penalty = self.overflow_penalty if self.overflow_penalty is not None else horizon
+        by_id = {agent.id: agent for agent in agents}
+        distances = {agent.id: self.fields.distances(agent) for agent in agents}
+
+        # Drop agents that left
+        queue = []
+        for k, held in enumerate(self.held):
+            kept = [(bid, agent_id) for bid, agent_id in held if agent_id in by_id]
+            heapq.heapify(kept)
+            self.held[k] = kept
+        self.assignment = {agent_id: k for k, held in enumerate(self.held) for _, agent_id in held}
+
+        # Warm start: keep every assignment that is still within epsilon of the agent's best choice
+        prices = [self.price(k, capacity) for k in range(len(self.held))]
+        released = set()
+        for agent_id in by_id:
+            k = self.assignment.get(agent_id)
+            if k is None:
+                queue.append(agent_id)
+                continue
+            values = [-d - p for d, p in zip(distances[agent_id], prices) if d != UNREACHABLE]
+            if distances[agent_id][k] == UNREACHABLE or -distances[agent_id][k] - prices[k] < max(values) - self.epsilon:
+                released.add(agent_id)
+        if released:
+            for k, held in enumerate(self.held):
+                held[:] = [entry for entry in held if entry[1] not in released]
+                heapq.heapify(held)
+            for agent_id in released:
+                self.assignment.pop(agent_id, None)
+            queue.extend(released)
+
+        self.run_auction(queue, distances, capacity, penalty)
+
+        for agent in agents:
+            k = self.assignment.get(agent.id)
+            if k is None:
+                reachable = [(d, i) for i, d in enumerate(distances[agent.id]) if d != UNREACHABLE]
+                k = min(reachable)[1] if reachable else None
+            agent.target_exit = self.game_map.exit_doors[k] if k is not None else None
+
+    def run_auction(self, queue, distances, capacity, penalty):
+        epsilon = self.epsilon
+        while queue:
+            agent_id = queue.pop()
+            best = None
+            best_value = second_value = -math.inf
+            for k, d in enumerate(distances[agent_id]):
+                if d == UNREACHABLE:
+                    continue
+                value = -d - self.price(k, capacity)
+                if value > best_value:
+                    second_value = best_value
+                    best, best_value = k, value
+                elif value > second_value:
+                    second_value = value
+            if best is None:
+                continue
+
+            # Overflow to the nearest exit is always available at a fixed cost
+            overflow_value = -min(d for d in distances[agent_id] if d != UNREACHABLE) - penalty
+            if best_value <= overflow_value:
+                continue
+            second_value = max(second_value, overflow_value)
+
+            bid = self.price(best, capacity) + (best_value - second_value) + epsilon
+            held = self.held[best]
+            heapq.heappush(held, (bid, agent_id))
+            self.assignment[agent_id] = best
+            self.bids += 1
+            if len(held) > capacity[best]:
+                _, outbid = heapq.heappop(held)
+                self.assignment.pop(outbid, None)
+                queue.append(outbid)
+
+    def loads(self):
+        return [len(held) for held in self.held]
@@ -0,0 +1,97 @@
+class FireState:
+    # Burning cells of a Map. Every burning cell is one bit in a bitmap; only the front, the cells
+    # that still have a free unburned neighbour, is kept as an insertion-ordered index set and
+    # rescanned each spread. Interior cells retire to the bitmap, so memory and per-tick work
+    # follow the size of the front rather than the burned area.
+    def __init__(self, cols, rows, grid_size, walls):
+        self.cols = cols
+        self.rows = rows
+        self.grid_size = grid_size
+        self.walls = walls
+        self.bits = bytearray((cols * rows + 7) // 8)
+        self.front = {}
+        self.count = 0
+
+    def cell(self, x, y):
+        col, row = x // self.grid_size, y // self.grid_size
+        if 0 <= col < self.cols and 0 <= row < self.rows:
+            return row * self.cols + col
+        return None
+
+    def position(self, cell):
+        row, col = divmod(cell, self.cols)
+        return col * self.grid_size, row * self.grid_size
+
+    def burning(self, cell):
+        return self.bits[cell >> 3] >> (cell & 7) & 1
+
+    def __contains__(self, position):
+        cell = self.cell(*position)
+        return cell is not None and bool(self.burning(cell))
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for index, byte in enumerate(self.bits):
+            if byte:
+                for bit in range(8):
+                    if byte >> bit & 1:
+                        yield self.position(index * 8 + bit)
+
+    def frontier(self):
+        return [self.position(cell) for cell in self.front]
+
+    def ignite(self, cell):
+        if self.burning(cell):
+            return False
+        self.bits[cell >> 3] |= 1 << (cell & 7)
+        self.front[cell] = None
+        self.count += 1
+        return True
+
+    def add_wall(self, x, y):
+        pass
+
+    def remove_wall(self, x, y):
+        # Burning cells retired next to the old wall can spread through the opening again
+        cell = self.cell(x, y)
+        if cell is not None:
+            for neighbor in self.neighbors(cell):
+                if self.burning(neighbor):
+                    self.front[neighbor] = None
+
+    def neighbors(self, cell):
+        cols = self.cols
+        row, col = divmod(cell, cols)
+        if col > 0:
+            yield cell - 1
+        if col < cols - 1:
+            yield cell + 1
+        if row > 0:
+            yield cell - cols
+        if row < self.rows - 1:
+            yield cell + cols
+
+    def spread(self, probability, rng):
+        # Same draw order as scanning the old fire list: one draw per (front cell, free neighbour)
+        candidates = []
+        retired = []
+        walls = self.walls
+        for cell in self.front:
+            found = False
+            for neighbor in self.neighbors(cell):
+                if not self.burning(neighbor) and self.position(neighbor) not in walls:
+                    candidates.append(neighbor)
+                    found = True
+            if not found:
+                retired.append(cell)
+        for cell in retired:
+            del self.front[cell]
+
+        ignited = []
+        for cell in candidates:
+            if not self.burning(cell) and rng.random() < probability:
+                self.ignite(cell)
+                ignited.append(cell)
+        return ignited
@@ -0,0 +1,39 @@
+from collections import deque
+
+
+def fire_arrival_times(game_map, probability, interval):
+    # Every spread attempt ignites a neighbour with the given probability, so crossing one
+    # edge takes interval / probability ticks on average. Edges are uniform, so BFS is Dijkstra.
+    ticks_per_cell = interval / probability if probability > 0 else float('inf')
+    size = game_map.grid_size
+    walls = game_map.walls
+
+    # Only the active front can spread, so burned-out interior cells are never visited
+    burning = game_map.fire_positions
+    hops = {position: 0 for position in burning.frontier()}
+    queue = deque(hops)
+    while queue:
+        x, y = queue.popleft()
+        depth = hops[(x, y)] + 1
+        for dx, dy in [(-size, 0), (size, 0), (0, -size), (0, size)]:
+            neighbor = (x + dx, y + dy)
+            if (neighbor in hops or neighbor in walls or not game_map.in_bounds(*neighbor)
+                    or neighbor in burning):
+                continue
+            hops[neighbor] = depth
+            queue.append(neighbor)
+
+    return {position: depth * ticks_per_cell for position, depth in hops.items()}
+
+
+def path_margin(path, arrival, ticks_per_move=1):
+    # Smallest head start, in ticks, the agent keeps over the fire along the path; negative means
+    # overtaken. The agent makes one move every ticks_per_move ticks.
+    margin = float('inf')
+    for step, position in enumerate(path, start=1):
+        margin = min(margin, arrival.get(position, float('inf')) - step * ticks_per_move)
+    return margin
+
+
+def estimate_survivors(agents, arrival, ticks_per_move=1):
+    return sum(1 for agent in agents if agent.path and path_margin(agent.path, arrival, ticks_per_move) > 0)
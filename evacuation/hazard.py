@@ -0,0 +1,87 @@
+SMOKE_DIFFUSION = 0.2
+SMOKE_DECAY = 0.05
+SMOKE_THRESHOLD = 0.05
+# Health lost per tick by an agent standing in a cell at full concentration (a burning cell)
+SMOKE_DAMAGE = 5
+# Extra planner cost for stepping into a cell at full concentration
+SMOKE_COST = 10
+
+
+class HazardField:
+    # Smoke and heat concentration per cell, 1.0 on burning cells. Each tick it diffuses with a
+    # five-point stencil over the free cells (walls are no-flux) and decays, all as whole-array
+    # NumPy operations. Agents are damaged by one gather of the field at their cells, and the
+    # planner reads a flat per-cell cost list refreshed once per step, as a cost layer.
+    def __init__(self, game_map, diffusion=SMOKE_DIFFUSION, decay=SMOKE_DECAY, threshold=SMOKE_THRESHOLD,
+                 damage_rate=SMOKE_DAMAGE, cost_scale=SMOKE_COST):
+        import numpy as np
+
+        self.game_map = game_map
+        self.diffusion = diffusion
+        self.decay = decay
+        self.threshold = threshold
+        self.damage_rate = damage_rate
+        self.cost_scale = cost_scale
+        self.field = np.zeros((game_map.rows, game_map.cols), dtype=np.float32)
+        self.free = np.ones((game_map.rows, game_map.cols), dtype=bool)
+        size = game_map.grid_size
+        for x, y in game_map.walls:
+            if game_map.in_bounds(x, y):
+                self.free[y // size, x // size] = False
+        self.costs = [0.0] * (game_map.rows * game_map.cols)
+
+    def add_wall(self, x, y):
+        size = self.game_map.grid_size
+        self.free[y // size, x // size] = False
+        self.field[y // size, x // size] = 0
+
+    def remove_wall(self, x, y):
+        size = self.game_map.grid_size
+        self.free[y // size, x // size] = True
+
+    def burning(self):
+        import numpy as np
+
+        fires = self.game_map.fire_positions
+        bits = np.unpackbits(np.frombuffer(fires.bits, dtype=np.uint8), bitorder='little')
+        return bits[:fires.cols * fires.rows].reshape(fires.rows, fires.cols).astype(bool)
+
+    def step(self):
+        import numpy as np
+
+        field, free = self.field, self.free
+        burning = self.burning()
+        field[burning] = 1.0
+        # Flux across every edge between two free cells, horizontal then vertical
+        flow = np.zeros_like(field)
+        for axis in (0, 1):
+            lower = [slice(None), slice(None)]
+            upper = [slice(None), slice(None)]
+            lower[axis], upper[axis] = slice(None, -1), slice(1, None)
+            lower, upper = tuple(lower), tuple(upper)
+            flux = (field[upper] - field[lower]) * (free[upper] & free[lower])
+            flow[lower] += flux
+            flow[upper] -= flux
+        field += self.diffusion * flow
+        field *= 1 - self.decay
+        field[burning] = 1.0
+        field[~free] = 0
+        self.costs = (np.where(field > self.threshold, field, 0) * self.cost_scale).ravel().tolist()
+
+    def concentration(self, agents):
+        import numpy as np
+
+        size = self.game_map.grid_size
+        cells = np.array([(agent.y, agent.x) for agent in agents], dtype=np.intp).reshape(-1, 2) // size
+        return self.field[cells[:, 0], cells[:, 1]]
+
+    def damage(self, agents):
+        # Health lost this tick by each agent, in the same order, from one gather of the field
+        import numpy as np
+
+        values = self.concentration(agents)
+        return np.where(values > self.threshold, values * self.damage_rate, 0).tolist()
+
+    def cost(self, position, step=None):
+        size = self.game_map.grid_size
+        return self.costs[(position[1] // size) * self.game_map.cols + position[0] // size]
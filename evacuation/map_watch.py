@@ -0,0 +1,68 @@
+import os
+import json
+import time
+
+# Seconds between checks of the map file's modification time
+WATCH_INTERVAL = 0.5
+
+
+def layout_walls(map_data):
+    # Same formats Map accepts: a plain wall list or a level dict with 'walls'
+    if isinstance(map_data, list):
+        map_data = {'walls': map_data}
+    return {(entry['x'], entry['y']) for entry in map_data.get('walls', [])}
+
+
+class MapWatcher:
+    # Hot reload for a running simulation. The map file is polled by modification time, and a
+    # changed layout is diffed cell by cell against the loaded walls and applied as single wall
+    # edits, so the routing table, connectivity labels, hazard and render layers only update
+    # around the cells that changed, and agents whose route crosses a new wall are replanned.
+    # Exits and entries are read once at start; moving them still needs a restart.
+    def __init__(self, game_map, map_file=None, interval=WATCH_INTERVAL):
+        self.game_map = game_map
+        self.map_file = map_file or game_map.map_file
+        self.interval = interval
+        self.checked = time.monotonic()
+        self.stamp = self.file_stamp()
+        self.reloads = 0
+        self.last_reload_ms = None
+        self.last_change = (set(), set())
+
+    def file_stamp(self):
+        try:
+            stat = os.stat(self.map_file)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def poll(self):
+        now = time.monotonic()
+        if now - self.checked < self.interval:
+            return None
+        self.checked = now
+        return self.check()
+
+    def check(self):
+        # (added, removed) wall positions, or None when the file has not changed
+        stamp = self.file_stamp()
+        if stamp is None or stamp == self.stamp:
+            return None
+        try:
+            with open(self.map_file, 'r') as file:
+                map_data = json.load(file)
+        except (OSError, json.JSONDecodeError):
+            # Most likely caught mid-save; the old stamp is kept so the next poll tries again
+            return None
+        self.stamp = stamp
+        return self.apply(map_data)
+
+    def apply(self, map_data):
+        start = time.perf_counter()
+        added, removed = self.game_map.update_walls(layout_walls(map_data))
+        if isinstance(map_data, dict) and 'rooms' in map_data:
+            self.game_map.rooms = map_data['rooms']
+        self.reloads += 1
+        self.last_reload_ms = (time.perf_counter() - start) * 1000
+        self.last_change = added, removed
+        return added, removed
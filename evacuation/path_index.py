@@ -0,0 +1,42 @@
+class PathIndex:
+    # Reverse index from grid positions to the agents whose remaining path crosses them, so a fire
+    # or wall update only sends the agents it actually touches back to the planner
+    def __init__(self):
+        self.agents_by_cell = {}
+        self.pending = set()
+        self.replans = 0
+        self.avoided = 0
+
+    def set_path(self, agent, old_path, path):
+        for position in old_path:
+            self.discard(agent, position)
+        for position in path:
+            self.agents_by_cell.setdefault(position, set()).add(agent)
+
+    def discard(self, agent, position):
+        agents = self.agents_by_cell.get(position)
+        if agents is not None:
+            agents.discard(agent)
+            if not agents:
+                del self.agents_by_cell[position]
+
+    def remove(self, agent):
+        for position in agent.path:
+            self.discard(agent, position)
+
+    def add_wall(self, x, y):
+        self.pending.add((x, y))
+
+    def remove_wall(self, x, y):
+        # Opening a wall never breaks an existing path
+        pass
+
+    def invalidate(self, positions):
+        self.pending.update(positions)
+
+    def take_affected(self):
+        affected = set()
+        for position in self.pending:
+            affected.update(self.agents_by_cell.get(position, ()))
+        self.pending.clear()
+        return affected
@@ -0,0 +1,71 @@
+from array import array
+
+
+class Path:
+    # An agent's remaining route: int32 cell indexes plus a cursor. Stepping moves the cursor
+    # instead of list.pop(0) shifting every later entry, and a route costs 4 bytes per cell
+    # instead of a list slot and a tuple of two ints, so the garbage collector has almost nothing
+    # to track. Reads still give (x, y) pixel positions, like the lists it replaces.
+    __slots__ = ('cells', 'start', 'cols', 'grid_size')
+
+    def __init__(self, cells, cols, grid_size, start=0):
+        self.cells = cells
+        self.start = start
+        self.cols = cols
+        self.grid_size = grid_size
+
+    @classmethod
+    def empty(cls, cols, grid_size):
+        # No route: falsy, and popleft() raises IndexError like a Path that has been walked to the end
+        return cls(array('i'), cols, grid_size)
+
+    @classmethod
+    def from_positions(cls, positions, cols, grid_size):
+        return cls(array('i', [(y // grid_size) * cols + x // grid_size for x, y in positions]), cols, grid_size)
+
+    def position(self, cell):
+        row, col = divmod(cell, self.cols)
+        return col * self.grid_size, row * self.grid_size
+
+    def __len__(self):
+        return len(self.cells) - self.start
+
+    def __bool__(self):
+        return self.start < len(self.cells)
+
+    def __iter__(self):
+        position = self.position
+        for i in range(self.start, len(self.cells)):
+            yield position(self.cells[i])
+
+    def next_cell(self):
+        # Cell index of the next step, for lookups in per-cell layers such as FireState.burning
+        return self.cells[self.start]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            begin, end, stride = index.indices(len(self))
+            if stride != 1:
+                raise ValueError("Path slices must be contiguous")
+            return Path(self.cells[self.start + begin:self.start + max(begin, end)], self.cols, self.grid_size)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Path index out of range")
+        return self.position(self.cells[self.start + index])
+
+    def __eq__(self, other):
+        try:
+            return list(self) == list(other)
+        except TypeError:
+            return NotImplemented
+
+    def __repr__(self):
+        return f"Path({list(self)!r})"
+
+    def popleft(self):
+        if self.start >= len(self.cells):
+            raise IndexError("popleft from an empty Path")
+        row, col = divmod(self.cells[self.start], self.cols)
+        self.start += 1
+        return col * self.grid_size, row * self.grid_size
@@ -0,0 +1,44 @@
+class TickPipeline:
+    # Double-buffered ticks. Simulation.step runs on one worker thread a tick ahead of the caller:
+    # while tick N+1 spreads fire, plans and moves, the caller draws tick N from the copies that
+    # finish(tick) took on the worker as the tick ended, so nothing it reads is being written.
+    # Steps still run one after another in the same order, which keeps a seeded run identical
+    # to calling step() in a loop. Map edits are queued with edit() and applied between steps.
+    def __init__(self, simulation, finish=None):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.simulation = simulation
+        self.finish = finish
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.edits = []
+        self.pending = None
+
+    @property
+    def running(self):
+        return self.pending is not None
+
+    def edit(self, function, *args):
+        self.edits.append((function, args))
+
+    def run_step(self):
+        tick = self.simulation.step()
+        return self.finish(tick) if self.finish else tick
+
+    def advance(self):
+        # Waits for the tick in flight and starts the next one; returns finish(tick) for the tick
+        # that just ended, or None on the first call
+        result = self.pending.result() if self.pending else None
+        edits, self.edits = self.edits, []
+        for function, args in edits:
+            function(*args)
+        if self.simulation.agents:
+            self.pending = self.executor.submit(self.run_step)
+        else:
+            self.pending = None
+        return result
+
+    def close(self):
+        if self.pending:
+            self.pending.result()
+            self.pending = None
+        self.executor.shutdown()
@@ -0,0 +1,131 @@
+BACKGROUND_COLOR = (255, 255, 255)
+GRID_COLOR = (200, 200, 200)
+WALL_COLOR = (255, 0, 0)
+FIRE_COLOR = (255, 165, 0)
+EXIT_COLOR = (0, 0, 0)
+ENTRY_COLOR = (0, 255, 0)
+HEALTH_COLOR = (0, 255, 0)
+HEALTH_BAR_HEIGHT = 5
+HEALTH_BAR_OFFSET = 10
+
+
+class FrameState:
+    # Copies of everything one frame shows, taken at the end of a tick, so the frame can be drawn
+    # while the simulation is already stepping the next tick on another thread
+    def __init__(self, cells, fire_mask, agents):
+        self.cells = cells
+        self.fire_mask = fire_mask
+        self.agents = agents
+
+
+class FrameRenderer:
+    # Draws a whole frame as one NumPy color buffer: the map layers are kept per cell, fire comes
+    # straight from the FireState bitmap, and every agent is written with one fancy-indexed
+    # assignment. The buffer is upscaled to pixels and handed to pygame in a single blit, so the
+    # cost per frame barely depends on how many cells are burning or how many agents there are.
+    def __init__(self, game_map, health_bars=False, grid_lines=True):
+        import numpy as np
+
+        self.game_map = game_map
+        self.health_bars = health_bars
+        self.grid_lines = grid_lines
+        size = game_map.grid_size
+        self.cells = np.empty((game_map.cols, game_map.rows, 3), dtype=np.uint8)
+        self.cells[:] = BACKGROUND_COLOR
+        for x, y in game_map.walls:
+            if game_map.in_bounds(x, y):
+                self.cells[x // size, y // size] = WALL_COLOR
+
+        # Exits and entries are drawn over fire, so they are painted again every frame
+        self.markers = [(door.x // size, door.y // size, EXIT_COLOR) for door in game_map.exit_doors]
+        self.markers += [(entry.x // size, entry.y // size, ENTRY_COLOR) for entry in game_map.entry_points]
+        game_map.wall_listeners.append(self)
+
+    def add_wall(self, x, y):
+        size = self.game_map.grid_size
+        self.cells[x // size, y // size] = WALL_COLOR
+
+    def remove_wall(self, x, y):
+        size = self.game_map.grid_size
+        self.cells[x // size, y // size] = BACKGROUND_COLOR
+
+    def fire_mask(self):
+        import numpy as np
+
+        fires = self.game_map.fire_positions
+        bits = np.unpackbits(np.frombuffer(fires.bits, dtype=np.uint8), bitorder='little')
+        return bits[:fires.cols * fires.rows].reshape(fires.rows, fires.cols).T.astype(bool)
+
+    def render_map(self, fire_mask=None, cells=None):
+        # Map layers only; fire_mask and cells default to what is burning and walled in the map now
+        size = self.game_map.grid_size
+        cells = (self.cells if cells is None else cells).copy()
+        cells[self.fire_mask() if fire_mask is None else fire_mask] = FIRE_COLOR
+        for col, row, color in self.markers:
+            cells[col, row] = color
+        frame = cells.repeat(size, axis=0).repeat(size, axis=1)
+        if self.grid_lines:
+            frame[::size, :] = GRID_COLOR
+            frame[:, ::size] = GRID_COLOR
+        return frame
+
+    def render(self, agents, alpha=1.0):
+        frame = self.render_map()
+        if agents:
+            self.draw_agents(frame, agents, alpha)
+        return frame
+
+    def agent_arrays(self, agents):
+        import numpy as np
+
+        previous = np.array([agent.previous for agent in agents], dtype=float)
+        current = np.array([(agent.x, agent.y) for agent in agents], dtype=float)
+        colors = np.array([agent.color for agent in agents], dtype=np.uint8)
+        health = np.array([agent.health for agent in agents], dtype=float) if self.health_bars else None
+        return previous, current, colors, health, agents[0].size
+
+    def draw_agents(self, frame, agents, alpha):
+        self.draw_arrays(frame, self.agent_arrays(agents), alpha)
+
+    def draw_arrays(self, frame, arrays, alpha):
+        import numpy as np
+
+        previous, current, colors, health, size = arrays
+        # Interpolate between the last two ticks so motion stays smooth at any simulation speed
+        position = (previous + (current - previous) * alpha).astype(np.intp)
+        self.draw_positions(frame, position, colors, size, health)
+
+    def draw_positions(self, frame, position, colors, size, health=None):
+        # position: (n, 2) pixel corners, colors: (n, 3); health in percent draws a bar over each agent
+        import numpy as np
+
+        width, height = frame.shape[:2]
+        offsets = np.arange(size)
+        xs = np.clip(position[:, 0, None] + offsets, 0, width - 1)
+        ys = np.clip(position[:, 1, None] + offsets, 0, height - 1)
+        frame[xs[:, :, None], ys[:, None, :]] = colors[:, None, None, :]
+
+        if health is not None:
+            bar_ys = position[:, 1, None] - HEALTH_BAR_OFFSET + np.arange(HEALTH_BAR_HEIGHT)
+            visible = (bar_ys >= 0) & (bar_ys < height)
+            filled = offsets[None, :] < (size * health / 100)[:, None]
+            bar_colors = np.array([WALL_COLOR, HEALTH_COLOR], dtype=np.uint8)[filled.astype(np.intp)]
+            # Only the bar rows that are on screen, as (agent, row) pairs
+            agent, row = np.nonzero(visible)
+            frame[xs[agent], bar_ys[agent, row][:, None]] = bar_colors[agent]
+
+    def draw(self, surface, agents, alpha=1.0):
+        import pygame
+
+        pygame.surfarray.blit_array(surface, self.render(agents, alpha))
+
+    def snapshot(self, agents):
+        return FrameState(self.cells.copy(), self.fire_mask(), self.agent_arrays(agents) if agents else None)
+
+    def draw_snapshot(self, surface, state, alpha=1.0):
+        import pygame
+
+        frame = self.render_map(state.fire_mask, state.cells)
+        if state.agents:
+            self.draw_arrays(frame, state.agents, alpha)
+        pygame.surfarray.blit_array(surface, frame)
@@ -0,0 +1,250 @@
+import os
+import sys
+import heapq
+import struct
+import hashlib
+from array import array
+from collections import deque
+
+from .paths import Path
+
+UNREACHABLE = -1
+ROUTES_MAGIC = b'EVRT'
+ROUTES_VERSION = 2
+HEADER = struct.Struct('<4sHII20s')
+
+
+def cell_index(game_map, x, y):
+    return (y // game_map.grid_size) * game_map.cols + x // game_map.grid_size
+
+
+def cell_position(game_map, cell):
+    row, col = divmod(cell, game_map.cols)
+    return col * game_map.grid_size, row * game_map.grid_size
+
+
+def blocked_cells(game_map):
+    blocked = bytearray(game_map.rows * game_map.cols)
+    for x, y in game_map.walls:
+        if game_map.in_bounds(x, y):
+            blocked[cell_index(game_map, x, y)] = 1
+    return blocked
+
+
+def neighbors(cell, cols, rows):
+    row, col = divmod(cell, cols)
+    if row > 0:
+        yield cell - cols
+    if row < rows - 1:
+        yield cell + cols
+    if col > 0:
+        yield cell - 1
+    if col < cols - 1:
+        yield cell + 1
+
+
+def distance_field(blocked, cols, rows, sources):
+    # Multi-source BFS over free cells. Returns step distances, the next cell towards the
+    # nearest source and which source that is, all as flat int arrays indexed by cell.
+    size = cols * rows
+    distance = array('i', [UNREACHABLE]) * size
+    next_hop = array('i', [UNREACHABLE]) * size
+    source_id = array('h', [UNREACHABLE]) * size
+    queue = deque()
+    for i, cell in enumerate(sources):
+        # A walled-over source is no source, as in RoutingTable.add_wall
+        if distance[cell] == UNREACHABLE and not blocked[cell]:
+            distance[cell] = 0
+            source_id[cell] = i
+            queue.append(cell)
+
+    while queue:
+        cell = queue.popleft()
+        depth = distance[cell] + 1
+        for neighbor in neighbors(cell, cols, rows):
+            if distance[neighbor] == UNREACHABLE and not blocked[neighbor]:
+                distance[neighbor] = depth
+                next_hop[neighbor] = cell
+                source_id[neighbor] = source_id[cell]
+                queue.append(neighbor)
+    return distance, next_hop, source_id
+
+
+def map_signature(game_map):
+    digest = hashlib.sha1()
+    digest.update(struct.pack('<III', game_map.grid_size, game_map.cols, game_map.rows))
+    for x, y in sorted(game_map.walls):
+        digest.update(struct.pack('<ii', x, y))
+    digest.update(b'exits')
+    for exit_door in game_map.exit_doors:
+        digest.update(struct.pack('<ii', exit_door.x, exit_door.y))
+    return digest.digest()
+
+
+def routes_path(map_file):
+    return os.path.splitext(map_file)[0] + '.routes'
+
+
+class RoutingTable:
+    # Next hop, distance and chosen exit for every cell of a Map, each stored as a flat array
+    def __init__(self, game_map, distance, next_hop, exit_id, blocked=None):
+        self.game_map = game_map
+        self.cols = game_map.cols
+        self.rows = game_map.rows
+        self.distance = distance
+        self.next_hop = next_hop
+        self.exit_id = exit_id
+        self.blocked = blocked if blocked is not None else blocked_cells(game_map)
+        self.exit_cells = [cell_index(game_map, door.x, door.y) for door in game_map.exit_doors]
+
+    @classmethod
+    def build(cls, game_map):
+        blocked = blocked_cells(game_map)
+        exit_cells = [cell_index(game_map, door.x, door.y) for door in game_map.exit_doors]
+        distance, next_hop, exit_id = distance_field(blocked, game_map.cols, game_map.rows, exit_cells)
+        return cls(game_map, distance, next_hop, exit_id, blocked)
+
+    @classmethod
+    def load(cls, game_map, path=None):
+        # Returns None when the file is missing or was built for a different layout
+        path = path or routes_path(game_map.map_file)
+        try:
+            with open(path, 'rb') as file:
+                magic, version, cols, rows, signature = HEADER.unpack(file.read(HEADER.size))
+                if (magic != ROUTES_MAGIC or version != ROUTES_VERSION or (cols, rows) != (game_map.cols, game_map.rows)
+                        or signature != map_signature(game_map)):
+                    return None
+                size = cols * rows
+                distance, next_hop, exit_id = array('i'), array('i'), array('h')
+                distance.fromfile(file, size)
+                next_hop.fromfile(file, size)
+                exit_id.fromfile(file, size)
+        except (FileNotFoundError, EOFError, struct.error):
+            return None
+        return cls(game_map, distance, next_hop, exit_id)
+
+    @classmethod
+    def load_or_build(cls, game_map, path=None):
+        table = cls.load(game_map, path)
+        if table is None:
+            table = cls.build(game_map)
+            table.save(path)
+        return table
+
+    def save(self, path=None):
+        path = path or routes_path(self.game_map.map_file)
+        with open(path, 'wb') as file:
+            file.write(HEADER.pack(ROUTES_MAGIC, ROUTES_VERSION, self.cols, self.rows, map_signature(self.game_map)))
+            self.distance.tofile(file)
+            self.next_hop.tofile(file)
+            self.exit_id.tofile(file)
+
+    def query(self, x, y):
+        # (next position, steps to the exit, exit door) for the cell at x, y, or None if cut off
+        cell = cell_index(self.game_map, x, y)
+        if self.distance[cell] == UNREACHABLE:
+            return None
+        hop = self.next_hop[cell]
+        next_position = cell_position(self.game_map, hop) if hop != UNREACHABLE else (x, y)
+        return next_position, self.distance[cell], self.game_map.exit_doors[self.exit_id[cell]]
+
+    def route(self, x, y):
+        cell = cell_index(self.game_map, x, y)
+        if self.distance[cell] == UNREACHABLE:
+            return Path.empty(self.cols, self.game_map.grid_size)
+        cells = array('i')
+        while self.next_hop[cell] != UNREACHABLE:
+            cell = self.next_hop[cell]
+            cells.append(cell)
+        return Path(cells, self.cols, self.game_map.grid_size)
+
+    def add_wall(self, x, y):
+        # Only the cells whose route ran through the new wall are recomputed
+        cell = cell_index(self.game_map, x, y)
+        if self.blocked[cell]:
+            return 0
+        self.blocked[cell] = 1
+        cols, rows = self.cols, self.rows
+        distance, next_hop, exit_id = self.distance, self.next_hop, self.exit_id
+
+        subtree = [cell]
+        affected = {cell}
+        for current in subtree:
+            for neighbor in neighbors(current, cols, rows):
+                if next_hop[neighbor] == current and neighbor not in affected:
+                    affected.add(neighbor)
+                    subtree.append(neighbor)
+
+        for current in subtree:
+            distance[current] = UNREACHABLE
+            next_hop[current] = UNREACHABLE
+            exit_id[current] = UNREACHABLE
+
+        # Re-seed the hole from its boundary with the untouched distances around it
+        heap = []
+        for current in subtree[1:]:
+            for neighbor in neighbors(current, cols, rows):
+                if neighbor not in affected and distance[neighbor] != UNREACHABLE:
+                    heapq.heappush(heap, (distance[neighbor] + 1, current, neighbor))
+        self._settle(heap)
+        return len(subtree)
+
+    def remove_wall(self, x, y):
+        cell = cell_index(self.game_map, x, y)
+        if not self.blocked[cell]:
+            return 0
+        self.blocked[cell] = 0
+        heap = []
+        if cell in self.exit_cells:
+            heapq.heappush(heap, (0, cell, UNREACHABLE))
+        for neighbor in neighbors(cell, self.cols, self.rows):
+            if self.distance[neighbor] != UNREACHABLE:
+                heapq.heappush(heap, (self.distance[neighbor] + 1, cell, neighbor))
+        return self._settle(heap)
+
+    def _settle(self, heap):
+        # Dijkstra that only ever lowers distances, so it stops where the old table was already right
+        distance, next_hop, exit_id, blocked = self.distance, self.next_hop, self.exit_id, self.blocked
+        updated = 0
+        while heap:
+            depth, cell, parent = heapq.heappop(heap)
+            if blocked[cell] or (distance[cell] != UNREACHABLE and distance[cell] <= depth):
+                continue
+            distance[cell] = depth
+            next_hop[cell] = parent
+            exit_id[cell] = exit_id[parent] if parent != UNREACHABLE else self.exit_cells.index(cell)
+            updated += 1
+            for neighbor in neighbors(cell, self.cols, self.rows):
+                if not blocked[neighbor] and (distance[neighbor] == UNREACHABLE or distance[neighbor] > depth + 1):
+                    heapq.heappush(heap, (depth + 1, neighbor, cell))
+        return updated
+
+
+def main():
+    from .simulation import GRID_SIZE, SCREEN_WIDTH, SCREEN_HEIGHT, Map
+
+    if len(sys.argv) < 2:
+        print("Usage: python -m evacuation.routing MAP_FILE [X Y]")
+        sys.exit(1)
+    try:
+        game_map = Map(GRID_SIZE, SCREEN_WIDTH, SCREEN_HEIGHT, sys.argv[1])
+    except ValueError as error:
+        print(f"Error: {error}")
+        sys.exit(1)
+    table = RoutingTable.load_or_build(game_map)
+    if len(sys.argv) >= 4:
+        x, y = int(sys.argv[2]), int(sys.argv[3])
+        x, y = x // GRID_SIZE * GRID_SIZE, y // GRID_SIZE * GRID_SIZE
+        answer = table.query(x, y)
+        if answer is None:
+            print(f"({x}, {y}) has no route to an exit")
+        else:
+            next_position, steps, exit_door = answer
+            print(f"({x}, {y}) -> next {next_position}, {steps} steps to exit at ({exit_door.x}, {exit_door.y})")
+    else:
+        reachable = sum(1 for d in table.distance if d != UNREACHABLE)
+        print(f"Routing table saved to {routes_path(sys.argv[1])}: {reachable} of {len(table.distance)} cells reach an exit")
+
+
+if __name__ == "__main__":
+    main()
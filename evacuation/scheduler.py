@@ -0,0 +1,37 @@
+import time
+
+PLANNING_BUDGET_MS = 8
+
+
+class ReplanScheduler:
+    # Anytime planning queue. Agents that need a new route wait here and each tick the most urgent
+    # ones are planned until the budget is spent; the rest carry over to the next tick, so a burst
+    # of fires costs a few ticks of slightly stale routes instead of one long stalled tick.
+    # At least one agent is planned per tick, whatever the budget.
+    def __init__(self, budget_ms=PLANNING_BUDGET_MS):
+        self.budget = budget_ms / 1000
+        self.pending = {}
+        self.deferred = 0
+
+    def __len__(self):
+        return len(self.pending)
+
+    def submit(self, agents):
+        for agent in agents:
+            self.pending[agent] = None
+
+    def discard(self, agent):
+        self.pending.pop(agent, None)
+
+    def run(self, plan, urgency):
+        # plan(agent) computes and stores one route; urgency(agent) sorts, most urgent first
+        start = time.perf_counter()
+        planned = 0
+        for agent in sorted(self.pending, key=urgency):
+            if planned and time.perf_counter() - start >= self.budget:
+                break
+            del self.pending[agent]
+            plan(agent)
+            planned += 1
+        self.deferred += len(self.pending)
+        return planned
@@ -0,0 +1,168 @@
+import os
+import sys
+import json
+import stat
+import time
+import queue
+import socket
+import threading
+
+# Seconds between reads of a tailed file that has no new lines yet
+TAIL_INTERVAL = 0.1
+# Latency samples kept for the stats, the most recent ones
+LATENCY_SAMPLES = 10000
+
+# Event format: one per line, either JSON or two numbers, in pixels like the mouse handlers.
+#   {"x": 300, "y": 200}                     received time is the event time
+#   {"x": 300, "y": 200, "time": 1.7e9}      sensor time, seconds since the epoch
+#   300 200
+# Any cell inside the 10 px grid cell ignites that cell.
+
+
+def parse_event(line):
+    # (x, y, event time or None), or None for a line that is not an event
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        if line.startswith('{'):
+            event = json.loads(line)
+            return int(event['x']), int(event['y']), event.get('time')
+        x, y = line.replace(',', ' ').split()[:2]
+        return int(float(x)), int(float(y)), None
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def tail_lines(path, from_start=False, interval=TAIL_INTERVAL, stop=None):
+    # Follows a growing file like tail -f; also reads a named pipe, which ends when the writer closes.
+    # A file is opened right away so a bad path fails in the caller; opening a pipe waits for its
+    # writer, so that is left to whoever reads the lines.
+    if stat.S_ISFIFO(os.stat(path).st_mode):
+        return follow(lambda: open(path, 'r'), True, interval, stop)
+    file = open(path, 'r')
+    return follow(lambda: file, from_start, interval, stop)
+
+
+def follow(opener, from_start, interval, stop):
+    with opener() as file:
+        if not from_start:
+            file.seek(0, 2)
+        partial = ''
+        while stop is None or not stop.is_set():
+            line = file.readline()
+            if not line:
+                time.sleep(interval)
+                continue
+            partial += line
+            if partial.endswith('\n'):
+                yield partial
+                partial = ''
+
+
+def socket_lines(host, port):
+    # Connects to a sensor gateway that writes one event per line; a refused connection fails here
+    connection = socket.create_connection((host, port))
+    return receive_lines(connection)
+
+
+def receive_lines(connection):
+    with connection:
+        yield from connection.makefile('r')
+
+
+def open_source(spec, stop=None):
+    # '-' is standard input (a pipe), tcp://host:port a socket, anything else a file to tail
+    if spec == '-':
+        return sys.stdin
+    if spec.startswith('tcp://'):
+        host, port = spec[len('tcp://'):].rsplit(':', 1)
+        return socket_lines(host, int(port))
+    return tail_lines(spec, stop=stop)
+
+
+class SensorFeed:
+    # Fire events from building sensors. A daemon thread reads the source and queues each event
+    # with its arrival time; the simulation drains the queue once per tick, ignites the whole
+    # batch in one go and replans once for all of it. Latency is measured from the sensor's time
+    # (or arrival) to the end of the planning pass that leaves no replan waiting. Under a planning
+    # budget that can be a few ticks later, and it may wait on replans other events caused.
+    # source is a spec for open_source or any iterable of lines or (x, y) pairs, such as a list
+    # standing in for the sensors in tests. A source that cannot be opened raises here; one that
+    # fails later is re-raised from apply().
+    def __init__(self, source):
+        self.events = queue.Queue()
+        self.stop = threading.Event()
+        self.received = 0
+        self.rejected = 0
+        self.ignited = 0
+        self.batches = 0
+        self.latencies = []
+        self.batch = []
+        self.error = None
+        if isinstance(source, str):
+            source = open_source(source, self.stop)
+        self.thread = threading.Thread(target=self.read, args=(source,), daemon=True)
+        self.thread.start()
+
+    def read(self, source):
+        try:
+            for line in source:
+                if self.stop.is_set():
+                    break
+                event = parse_event(line) if isinstance(line, str) else (line[0], line[1], None)
+                if event is None:
+                    self.rejected += 1
+                    continue
+                x, y, sent = event
+                self.events.put((x, y, sent if sent is not None else time.time()))
+        except (OSError, UnicodeDecodeError) as error:
+            self.error = error
+
+    def drain(self):
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def apply(self, game_map):
+        # Ignites every event that arrived since the last tick; returns the newly burning positions
+        if self.error is not None:
+            raise self.error
+        events = self.drain()
+        self.received += len(events)
+        size = game_map.grid_size
+        positions = {(x // size * size, y // size * size) for x, y, _ in events}
+        ignited = game_map.add_fires(positions)
+        self.ignited += len(ignited)
+        if events:
+            self.batches += 1
+        self.batch += [sent for _, _, sent in events]
+        return ignited
+
+    def routed(self, waiting=0):
+        # Called once the tick's planning pass is done, with the number of agents still waiting
+        # for a route; events stay open until none are
+        if self.batch and not waiting:
+            now = time.time()
+            self.latencies.extend(now - sent for sent in self.batch)
+            del self.latencies[:-LATENCY_SAMPLES]
+            self.batch = []
+
+    def latency_stats(self):
+        # Event-to-route latency in milliseconds over the recent samples
+        if not self.latencies:
+            return None
+        samples = sorted(self.latencies)
+        return {
+            'events': len(samples),
+            'mean_ms': sum(samples) / len(samples) * 1000,
+            'p50_ms': samples[len(samples) // 2] * 1000,
+            'p95_ms': samples[min(len(samples) - 1, len(samples) * 95 // 100)] * 1000,
+            'max_ms': samples[-1] * 1000,
+        }
+
+    def close(self):
+        self.stop.set()
@@ -0,0 +1,277 @@
+import sys
+import json
+import time
+import asyncio
+
+from .clock import TICK_MS
+from .simulation import GRID_SIZE, NUM_AGENTS, SCREEN_WIDTH, SCREEN_HEIGHT, Map, Simulation, spawn_agents
+
+HOST = "127.0.0.1"
+PORT = 8765
+
+# Protocol: one JSON object per line in each direction.
+#   {"op": "create", "session": "a", "map": "map.json", "agents": 50, "seed": 1, "speed": 1.0}
+#   {"op": "fire", "session": "a", "x": 300, "y": 200}      same cells the right mouse button ignites
+#   {"op": "wall", "session": "a", "x": 300, "y": 200}      same cells the left mouse button walls off
+#   {"op": "subscribe", "session": "a"}                     full snapshot, then batched diffs
+#   {"op": "unsubscribe", "session": "a"}, {"op": "close", "session": "a"}, {"op": "list"}
+# "speed" follows SimulationClock: 1.0 is real time, null runs ticks back to back.
+# A subscription ends with {"type": "finished", ...} once no agent left can reach an exit (with
+# saved, lost and trapped counts), {"type": "error", ...} if a step raised, or {"type": "closed"}.
+
+
+def empty_diff():
+    return {'agents': {}, 'removed': set(), 'fires': [], 'walls': [], 'tick': None}
+
+
+def merge_diff(pending, tick, agents, removed, fires, walls):
+    pending['tick'] = tick
+    pending['agents'].update(agents)
+    for agent_id in removed:
+        pending['agents'].pop(agent_id, None)
+        pending['removed'].add(agent_id)
+    pending['fires'].extend(fires)
+    pending['walls'].extend(walls)
+
+
+class Subscriber:
+    # Diffs published while the client is still reading are merged into one pending batch,
+    # so a slow client costs at most one state-sized buffer instead of an unbounded queue
+    def __init__(self, writer):
+        self.writer = writer
+        self.pending = empty_diff()
+        self.ready = asyncio.Event()
+        self.messages = []
+
+    def publish(self, *diff):
+        merge_diff(self.pending, *diff)
+        self.ready.set()
+
+    def send(self, message):
+        self.messages.append(message)
+        self.ready.set()
+
+    async def run(self, session_name):
+        try:
+            while True:
+                await self.ready.wait()
+                self.ready.clear()
+                messages, self.messages = self.messages, []
+                pending, self.pending = self.pending, empty_diff()
+                for message in messages:
+                    self.writer.write(encode(message))
+                if pending['tick'] is not None:
+                    self.writer.write(encode({
+                        'type': 'diff',
+                        'session': session_name,
+                        'tick': pending['tick'],
+                        'agents': pending['agents'],
+                        'removed': sorted(pending['removed']),
+                        'fires': pending['fires'],
+                        'walls': pending['walls'],
+                    }))
+                await self.writer.drain()
+                if any(message.get('type') in ('finished', 'error', 'closed') for message in messages):
+                    return
+        except (ConnectionError, asyncio.CancelledError):
+            return
+
+
+class Session:
+    def __init__(self, name, map_file, num_agents, seed=None, speed=1.0, tick_ms=TICK_MS):
+        self.name = name
+        self.game_map = Map(GRID_SIZE, SCREEN_WIDTH, SCREEN_HEIGHT, map_file)
+        self.simulation = Simulation(self.game_map, seed=seed)
+        self.simulation.agents = spawn_agents(self.game_map, num_agents, self.simulation.random)
+        self.speed = speed
+        self.tick_seconds = tick_ms / 1000
+        self.edits = []
+        self.subscribers = {}
+        self.task = None
+        self.outcome = None
+        self.last_state = {agent.id: (agent.x, agent.y, agent.health) for agent in self.simulation.agents}
+
+    def snapshot(self):
+        return {
+            'type': 'snapshot',
+            'session': self.name,
+            'tick': self.simulation.tick,
+            'agents': {agent_id: list(state) for agent_id, state in self.last_state.items()},
+            'fires': [list(position) for position in self.game_map.fire_positions],
+            'walls': [list(position) for position in self.game_map.walls],
+        }
+
+    def apply_edits(self):
+        # Edits are applied between ticks, never while a step is running on the worker thread
+        walls = []
+        edits, self.edits = self.edits, []
+        for op, x, y in edits:
+            size = self.game_map.grid_size
+            x, y = x // size * size, y // size * size
+            if op == 'fire':
+                self.game_map.add_fire_at_position(x, y)
+            elif self.game_map.add_wall_at_position(x, y):
+                walls.append([x, y])
+        return walls
+
+    def diff(self, tick):
+        changed = {}
+        for agent in tick.agents:
+            state = (agent.x, agent.y, agent.health)
+            if self.last_state.get(agent.id) != state:
+                self.last_state[agent.id] = state
+                changed[agent.id] = list(state)
+        removed = [agent.id for agent in tick.exited + tick.dead]
+        for agent_id in removed:
+            self.last_state.pop(agent_id, None)
+        fires = [[fire.x, fire.y] for fire in tick.new_fires]
+        return changed, removed, fires
+
+    async def run(self):
+        # Ends with a finished message once nobody left can reach an exit, or an error one if a step
+        # fails; it is kept for clients that subscribe later
+        try:
+            await self.loop()
+        except Exception as error:
+            self.end({'type': 'error', 'session': self.name, 'tick': self.simulation.tick,
+                      'error': f"{type(error).__name__}: {error}"})
+            raise
+        self.end({'type': 'finished', 'session': self.name, 'tick': self.simulation.tick,
+                  'saved': self.simulation.saved, 'lost': self.simulation.lost,
+                  'trapped': len(self.simulation.trapped())})
+
+    def end(self, message):
+        self.outcome = message
+        for subscriber in self.subscribers.values():
+            subscriber.send(message)
+
+    async def loop(self):
+        next_tick = time.perf_counter()
+        while not self.simulation.finished():
+            walls = self.apply_edits()
+            tick = await asyncio.to_thread(self.simulation.step)
+            changed, removed, fires = self.diff(tick)
+            for subscriber in self.subscribers.values():
+                subscriber.publish(tick.number, changed, removed, fires, walls)
+
+            if self.speed is None:
+                await asyncio.sleep(0)
+            else:
+                next_tick += self.tick_seconds / self.speed
+                await asyncio.sleep(max(0.0, next_tick - time.perf_counter()))
+
+    def subscribe(self, key, writer):
+        subscriber = Subscriber(writer)
+        subscriber.send(self.snapshot())
+        if self.outcome:
+            subscriber.send(self.outcome)
+        self.subscribers[key] = subscriber
+        return asyncio.create_task(subscriber.run(self.name))
+
+    def unsubscribe(self, key):
+        return self.subscribers.pop(key, None)
+
+
+class SimulationService:
+    def __init__(self):
+        self.sessions = {}
+
+    def create(self, name, map_file, num_agents=NUM_AGENTS, seed=None, speed=1.0):
+        if name in self.sessions:
+            raise ValueError(f"session {name!r} already exists")
+        session = Session(name, map_file, num_agents, seed, speed)
+        session.task = asyncio.create_task(session.run())
+        self.sessions[name] = session
+        return session
+
+    def close(self, name):
+        session = self.sessions.pop(name)
+        session.task.cancel()
+        for subscriber in session.subscribers.values():
+            subscriber.send({'type': 'closed', 'session': name})
+
+    def get(self, name):
+        if name not in self.sessions:
+            raise KeyError(f"no session {name!r}")
+        return self.sessions[name]
+
+    async def handle_client(self, reader, writer):
+        key = object()
+        tasks = {}
+        try:
+            while line := await reader.readline():
+                try:
+                    reply = self.handle_request(json.loads(line), key, writer, tasks)
+                except (KeyError, ValueError, TypeError) as error:
+                    reply = {'ok': False, 'error': str(error)}
+                writer.write(encode(reply))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for name, task in tasks.items():
+                task.cancel()
+                if name in self.sessions:
+                    self.sessions[name].unsubscribe(key)
+            writer.close()
+
+    def handle_request(self, request, key, writer, tasks):
+        op = request['op']
+        if op == 'list':
+            return {'ok': True, 'sessions': {
+                name: {'tick': session.simulation.tick, 'agents': len(session.simulation.agents)}
+                for name, session in self.sessions.items()
+            }}
+
+        name = request['session']
+        if op == 'create':
+            session = self.create(name, request.get('map', 'map.json'), request.get('agents', NUM_AGENTS),
+                                  request.get('seed'), request.get('speed', 1.0))
+            return {'ok': True, 'session': name, 'agents': len(session.simulation.agents)}
+        if op in ('fire', 'wall'):
+            self.get(name).edits.append((op, int(request['x']), int(request['y'])))
+            return {'ok': True}
+        if op == 'subscribe':
+            if name in tasks:
+                tasks[name].cancel()
+            tasks[name] = self.get(name).subscribe(key, writer)
+            return {'ok': True}
+        if op == 'unsubscribe':
+            self.get(name).unsubscribe(key)
+            task = tasks.pop(name, None)
+            if task:
+                task.cancel()
+            return {'ok': True}
+        if op == 'close':
+            self.close(name)
+            return {'ok': True}
+        raise ValueError(f"unknown op {op!r}")
+
+
+def encode(message):
+    return (json.dumps(message, separators=(',', ':')) + '\n').encode()
+
+
+async def serve(host=HOST, port=PORT, unix_path=None):
+    service = SimulationService()
+    if unix_path:
+        server = await asyncio.start_unix_server(service.handle_client, unix_path)
+    else:
+        server = await asyncio.start_server(service.handle_client, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    # python -m evacuation.service [PORT | UNIX_SOCKET_PATH]
+    target = sys.argv[1] if len(sys.argv) > 1 else str(PORT)
+    if target.isdigit():
+        print(f"Simulation service listening on {HOST}:{target}")
+        asyncio.run(serve(port=int(target)))
+    else:
+        print(f"Simulation service listening on {target}")
+        asyncio.run(serve(unix_path=target))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,530 @@
+import json
+import heapq
+import random
+from array import array
+
+from .fire import FireState
+from .path_index import PathIndex
+from .connectivity import ConnectivityIndex
+from .spawning import FreeCellIndex, choose_colors
+from .fire_arrival import fire_arrival_times, estimate_survivors
+from .exit_assignment import ExitAssigner, ExitDistanceFields, ASSIGNMENT_INTERVAL
+from .cooperative import CooperativePlanner, COOPERATIVE_WINDOW
+from .scheduler import ReplanScheduler
+from .routing import RoutingTable
+from .map_watch import MapWatcher
+from .paths import Path
+from .costs import IMPASSABLE, FieldHeuristic, ManhattanHeuristic, default_layers
+
+SCREEN_WIDTH = 800
+SCREEN_HEIGHT = 600
+
+NUM_AGENTS = 50
+GRID_SIZE = 10
+FIRE_SPREAD_PROBABILITY = 0.3
+FIRE_SPREAD_INTERVAL = 2
+AGENT_MOVE_INTERVAL = 1
+FIRE_DAMAGE = 5
+# Headless runs stop here even if agents are still on their way
+MAX_TICKS = 2000
+# Times one agent may be sent back to the cooperative planner by others within a tick
+MAX_BUMPS = 3
+
+AGENT_COLORS = [(0, 128, 255), (0, 255, 128), (255, 0, 128), (128, 0, 255), (255, 128, 0)]
+
+
+class ExitDoor:
+    def __init__(self, x, y, size):
+        self.x = x
+        self.y = y
+        self.size = size
+
+    def check_collision(self, agent):
+        return (
+            agent.x < self.x + self.size
+            and agent.x + agent.size > self.x
+            and agent.y < self.y + self.size
+            and agent.y + agent.size > self.y
+        )
+
+
+class EntryPoint:
+    def __init__(self, x, y, size):
+        self.x = x
+        self.y = y
+        self.size = size
+
+
+class Map:
+    def __init__(self, grid_size, screen_width, screen_height, map_file):
+        self.grid_size = grid_size
+        self.width = screen_width
+        self.height = screen_height
+        self.rows = screen_height // grid_size
+        self.cols = screen_width // grid_size
+        self.map_file = map_file
+
+        # Plain wall lists (map.json) and level files with exits/entries are both accepted
+        map_data = self.load_map(map_file)
+        if isinstance(map_data, list):
+            map_data = {'walls': map_data}
+        self.walls = {(entry['x'], entry['y']) for entry in map_data.get('walls', [])}
+        self.exit_doors = [
+            ExitDoor(exit_coord['x'], exit_coord['y'], grid_size)
+            for exit_coord in map_data.get('exits', [])
+        ]
+        if not self.exit_doors:
+            self.exit_doors = [ExitDoor(screen_width - grid_size * 2, screen_height - grid_size * 2, grid_size)]
+        self.entry_points = [
+            EntryPoint(entry_coord['x'], entry_coord['y'], grid_size)
+            for entry_coord in map_data.get('entries', [])
+        ]
+        # Optional occupancy rectangles used to weight where agents are spawned
+        self.rooms = map_data.get('rooms', [])
+
+        # Burning cells as a bitmap plus the active front; new_fires only holds this tick's ignitions
+        self.fire_positions = FireState(self.cols, self.rows, grid_size, self.walls)
+        self.new_fires = []
+        # Indexes kept in sync with the walls; each gets add_wall(x, y) after a wall is placed and
+        # remove_wall(x, y) after one is taken out. wall_edits counts both.
+        self.wall_listeners = [self.fire_positions]
+        self.wall_edits = 0
+
+    @property
+    def exit_door(self):
+        return self.exit_doors[0]
+
+    def load_map(self, map_file):
+        # Raises ValueError so that a long-running caller (the service) survives a bad map;
+        # the command-line scripts report it and exit
+        try:
+            with open(map_file, 'r') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            raise ValueError(f"{map_file} not found.") from None
+        except OSError as error:
+            raise ValueError(f"Cannot read {map_file}: {error.strerror}.") from None
+        except json.JSONDecodeError:
+            raise ValueError(f"Invalid JSON format in {map_file}.") from None
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def spawn_new_fires(self, probability=FIRE_SPREAD_PROBABILITY, rng=random):
+        spawned = []
+        for cell in self.fire_positions.spread(probability, rng):
+            x, y = self.fire_positions.position(cell)
+            spawned.append(Fire(x, y, self.grid_size))
+        self.new_fires.extend(spawned)
+        return spawned
+
+    def add_fire_at_position(self, x, y):
+        if self.in_bounds(x, y) and self.fire_positions.ignite(self.fire_positions.cell(x, y)):
+            self.new_fires.append(Fire(x, y, self.grid_size))
+            return True
+        return False
+
+    def add_fires(self, positions):
+        # Bulk ignition, e.g. a batch of sensor events; returns the positions that were not burning yet
+        return [(x, y) for x, y in positions if self.add_fire_at_position(x, y)]
+
+    def add_wall_at_position(self, x, y):
+        if self.in_bounds(x, y):
+            if (x, y) not in self.walls and (x, y) not in self.fire_positions:
+                self.walls.add((x, y))
+                self.wall_edits += 1
+                for listener in self.wall_listeners:
+                    listener.add_wall(x, y)
+                return True
+        return False
+
+    def remove_wall_at_position(self, x, y):
+        if (x, y) in self.walls:
+            self.walls.discard((x, y))
+            self.wall_edits += 1
+            if self.in_bounds(x, y):
+                for listener in self.wall_listeners:
+                    listener.remove_wall(x, y)
+            return True
+        return False
+
+    def update_walls(self, walls):
+        # Edits the walls into the given set one cell at a time, openings first, so every listener
+        # updates incrementally around the cells that changed. Burning cells are never walled over.
+        removed = sorted(position for position in self.walls if position not in walls)
+        for x, y in removed:
+            self.remove_wall_at_position(x, y)
+        added = [position for position in sorted(walls - self.walls) if self.add_wall_at_position(*position)]
+        return added, removed
+
+
+class Fire:
+    def __init__(self, x, y, size):
+        self.x = x
+        self.y = y
+        self.size = size
+
+
+class Agent:
+    def __init__(self, x, y, size, speed, color, initial_health=100, agent_id=None):
+        self.id = agent_id
+        self.x = x
+        self.y = y
+        self.size = size
+        self.speed = speed
+        self.color = color
+        # No route yet; an empty Path reads no cells, so its width in cells does not matter
+        self.path = Path.empty(0, size)
+        self.health = initial_health
+        self.previous = (x, y)
+        self.target_exit = None
+
+    def move(self):
+        if self.path:
+            self.x, self.y = self.path.popleft()
+
+
+def astar(start, goal, walls, fires, avoid_fire=True, grid_size=GRID_SIZE,
+          screen_width=SCREEN_WIDTH, screen_height=SCREEN_HEIGHT, arrival=None, hazard=None,
+          layers=None, heuristic=None, stats=None, ticks_per_move=1):
+    # Every move costs 1 plus its cost layers (see evacuation.costs); layers defaults to fire,
+    # late arrival and hazard built from the other arguments. heuristic must not overestimate the
+    # remaining moves; stats, when given, counts expanded nodes under 'expanded'.
+    if layers is None:
+        layers = default_layers(fires, avoid_fire, arrival, hazard, ticks_per_move)
+    if heuristic is None:
+        heuristic = ManhattanHeuristic(grid_size)
+
+    h = heuristic(start, goal)
+    # Ties on f go to the node closer to the goal
+    open_list = [(h, h, start)]
+    closed_list = set()
+    came_from = {}
+    g_score = {start: 0}
+    steps = {start: 0}
+    expanded = 0
+
+    while open_list:
+        _, _, current = heapq.heappop(open_list)
+        if current in closed_list:
+            continue
+        if current == goal:
+            # Walked back as cell indexes straight into the int32 array the agent will step through
+            cols = screen_width // grid_size
+            cells = array('i')
+            while current in came_from:
+                cells.append((current[1] // grid_size) * cols + current[0] // grid_size)
+                current = came_from[current]
+            cells.reverse()
+            path = Path(cells, cols, grid_size)
+            break
+        closed_list.add(current)
+        expanded += 1
+
+        step = steps[current] + 1
+        for dx, dy in [(0, -grid_size), (0, grid_size), (-grid_size, 0), (grid_size, 0)]:
+            neighbor = (current[0] + dx, current[1] + dy)
+            if not (0 <= neighbor[0] < screen_width and 0 <= neighbor[1] < screen_height):
+                continue
+            if neighbor in closed_list or neighbor in walls:
+                continue
+            cost = 1
+            for layer in layers:
+                cost += layer.cost(neighbor, step)
+            if cost == IMPASSABLE:
+                continue
+            tentative_g_score = g_score[current] + cost
+            if tentative_g_score < g_score.get(neighbor, IMPASSABLE):
+                h = heuristic(neighbor, goal)
+                if h == IMPASSABLE:
+                    continue
+                came_from[neighbor] = current
+                g_score[neighbor] = tentative_g_score
+                steps[neighbor] = step
+                heapq.heappush(open_list, (tentative_g_score + h, h, neighbor))
+    else:
+        path = Path.empty(screen_width // grid_size, grid_size)
+
+    if stats is not None:
+        stats['expanded'] = stats.get('expanded', 0) + expanded
+    return path
+
+
+def calculate_astar(agent, game_map, arrival=None, connectivity=None, hazard=None, exit_fields=None,
+                    ticks_per_move=1):
+    # exit_fields, an up-to-date ExitDistanceFields, gives each exit an exact-around-walls heuristic
+    start = (agent.x, agent.y)
+    bounds = dict(grid_size=game_map.grid_size, screen_width=game_map.width, screen_height=game_map.height,
+                  arrival=arrival, hazard=hazard, ticks_per_move=ticks_per_move)
+
+    # Try every exit in turn, the assigned one first, first avoiding fire, then allowing traversal through it
+    exit_doors = game_map.exit_doors
+    if connectivity is not None:
+        # Exits walled off from the agent would only make A* flood its whole region twice
+        exit_doors = connectivity.reachable_exits(*start)
+    if agent.target_exit is not None:
+        exit_doors = [door for door in exit_doors if door is agent.target_exit] + \
+            [door for door in exit_doors if door is not agent.target_exit]
+    for exit_door in exit_doors:
+        goal = (exit_door.x, exit_door.y)
+        if exit_fields is not None:
+            field = exit_fields.fields[game_map.exit_doors.index(exit_door)]
+            bounds['heuristic'] = FieldHeuristic(game_map, field)
+        path = astar(start, goal, game_map.walls, game_map.fire_positions, avoid_fire=True, **bounds)
+        if not path:
+            path = astar(start, goal, game_map.walls, game_map.fire_positions, avoid_fire=False, **bounds)
+        if path:
+            return agent, path
+    return agent, Path.empty(game_map.width // game_map.grid_size, game_map.grid_size)
+
+
+def spawn_agents(game_map, num_agents, rng=random, speed=5, density=None, replace=True):
+    # rng may be a random.Random or a numpy Generator; density is a per-cell weight (see room_density)
+    index = FreeCellIndex(game_map)
+    cells = index.sample(num_agents, rng, density, replace)
+    colors = choose_colors(rng, AGENT_COLORS, num_agents)
+    agents = []
+    for i, (cell, color) in enumerate(zip(cells, colors)):
+        x, y = index.position(cell)
+        agents.append(Agent(x, y, game_map.grid_size, speed, color, agent_id=i))
+    return agents
+
+
+class Tick:
+    def __init__(self, number, agents, new_fires, exited, dead):
+        self.number = number
+        self.agents = agents
+        self.new_fires = new_fires
+        self.exited = exited
+        self.dead = dead
+
+
+class Simulation:
+    def __init__(self, game_map, agents=None, seed=None, fire_spread_probability=FIRE_SPREAD_PROBABILITY,
+                 fire_spread_interval=FIRE_SPREAD_INTERVAL, agent_move_interval=AGENT_MOVE_INTERVAL,
+                 assign_exits=False, cooperative=False, cooperative_window=COOPERATIVE_WINDOW, hazard=False,
+                 planning_budget_ms=None, watch_map=False, sensors=None):
+        self.game_map = game_map
+        self.agents = agents if agents is not None else []
+        self.random = random.Random(seed)
+        self.fire_spread_probability = fire_spread_probability
+        self.fire_spread_interval = fire_spread_interval
+        self.agent_move_interval = agent_move_interval
+        self.tick = 0
+        self.moves = 0
+        self.saved = 0
+        self.lost = 0
+        self.fire_arrival = {}
+        self.arrival_walls = None
+        # Spreads agents over exits by capacity instead of sending everyone to the first reachable one
+        self.exit_assigner = ExitAssigner(game_map) if assign_exits else None
+        # Walking distance from every cell to each exit: the planners' heuristic, shared with the assigner
+        if self.exit_assigner:
+            self.exit_fields = self.exit_assigner.fields
+        else:
+            self.exit_fields = ExitDistanceFields(game_map)
+            game_map.wall_listeners.append(self.exit_fields)
+        # Agents keep their route until a new fire or wall lands on it
+        self.path_index = PathIndex()
+        game_map.wall_listeners.append(self.path_index)
+        # Agents walled off from every exit are never sent to the planner
+        self.connectivity = ConnectivityIndex(game_map)
+        game_map.wall_listeners.append(self.connectivity)
+        # Agents plan around each other's reservations instead of walking through one another
+        self.cooperative = None
+        if cooperative:
+            self.cooperative = CooperativePlanner(game_map, cooperative_window, self.exit_fields,
+                                                  agent_move_interval)
+        # Smoke and heat diffusing from the fire replace the flat damage for stepping into it (needs NumPy)
+        self.hazard = None
+        if hazard:
+            from .hazard import HazardField
+
+            self.hazard = HazardField(game_map)
+            game_map.wall_listeners.append(self.hazard)
+            if self.cooperative:
+                self.cooperative.hazard = self.hazard
+        # With a budget, A* replans are spread over ticks most urgent first instead of all finishing
+        # every tick. Which agents fit in the budget depends on timing, so runs stop being reproducible.
+        self.scheduler = None
+        if planning_budget_ms is not None:
+            self.scheduler = ReplanScheduler(planning_budget_ms)
+            # Shortest-route tree to the nearest exit, handed out instantly while A* catches up
+            self.routing = RoutingTable.build(game_map)
+            game_map.wall_listeners.append(self.routing)
+        # Edits saved to the map file are applied between ticks as wall diffs
+        self.map_watcher = MapWatcher(game_map) if watch_map else None
+        # A SensorFeed: fire events that arrived since the last tick are ignited as one batch
+        self.sensors = sensors
+
+    def update_fire_arrival(self, new_fires):
+        # Only recomputed when the fire front or the walls actually changed
+        if new_fires or self.arrival_walls != self.game_map.wall_edits:
+            self.fire_arrival = fire_arrival_times(self.game_map, self.fire_spread_probability,
+                                                   self.fire_spread_interval)
+            self.arrival_walls = self.game_map.wall_edits
+
+    def expected_survivors(self):
+        return estimate_survivors(self.agents, self.fire_arrival, self.agent_move_interval)
+
+    def plan(self, agents=None):
+        # Imported here: concurrent.futures pulls in logging and threading, which short-lived
+        # workers that never plan should not pay for at import time
+        from concurrent.futures import ThreadPoolExecutor
+
+        agents = self.agents if agents is None else agents
+        # Rebuilt here, before any planning thread reads it, if walls changed
+        self.exit_fields.refresh()
+        if self.cooperative:
+            # Sequential on purpose: each agent plans around the reservations of the ones before it
+            self.cooperative.arrival = self.fire_arrival
+            queue = list(agents)
+            bumped = {}
+            for agent in queue:
+                path = self.cooperative.plan(agent, self.moves)
+                self.path_index.set_path(agent, agent.path, path)
+                agent.path = path
+                for other in self.cooperative.bumped:
+                    if bumped.get(other, 0) < MAX_BUMPS:
+                        bumped[other] = bumped.get(other, 0) + 1
+                        queue.append(other)
+                self.cooperative.bumped.clear()
+            self.path_index.replans += len(queue)
+            return
+        if self.scheduler is not None:
+            for agent in agents:
+                self.hold(agent)
+            self.scheduler.submit(agents)
+            self.path_index.replans += self.scheduler.run(self.plan_agent, self.urgency)
+            return
+        with ThreadPoolExecutor() as executor:
+            futures = [executor.submit(calculate_astar, agent, self.game_map, self.fire_arrival, self.connectivity,
+                                       self.hazard, self.exit_fields, self.agent_move_interval)
+                       for agent in agents]
+            for future in futures:
+                agent, path = future.result()
+                self.path_index.set_path(agent, agent.path, path)
+                agent.path = path
+        self.path_index.replans += len(agents)
+
+    def plan_agent(self, agent):
+        _, path = calculate_astar(agent, self.game_map, self.fire_arrival, self.connectivity, self.hazard,
+                                  self.exit_fields, self.agent_move_interval)
+        self.path_index.set_path(agent, agent.path, path)
+        agent.path = path
+
+    def urgency(self, agent):
+        # Agents whose interim route is blocked first, then by how soon the fire is expected at their cell
+        return bool(agent.path), self.fire_arrival.get((agent.x, agent.y), float('inf'))
+
+    def hold(self, agent):
+        # Interim route while the agent waits for A*: its old route, or the nearest exit's route tree
+        # when it has none, cut before the first cell that is now a wall or on fire
+        path = agent.path or self.routing.route(agent.x, agent.y)
+        walls, fires = self.game_map.walls, self.game_map.fire_positions
+        for i, position in enumerate(path):
+            if position in walls or position in fires:
+                path = path[:i]
+                break
+        if path is not agent.path:
+            self.path_index.set_path(agent, agent.path, path)
+            agent.path = path
+
+    def agents_to_replan(self, retargeted=()):
+        affected = self.path_index.take_affected()
+        affected.update(retargeted)
+        if self.cooperative:
+            affected.update(self.cooperative.scheduled(self.agents, self.tick))
+        can_exit = self.connectivity.can_exit
+        replan = [agent for agent in self.agents
+                  if (not agent.path or agent in affected) and can_exit(agent.x, agent.y)]
+        for agent in affected:
+            # Cut off by a new wall: drop the stale route rather than walk into it
+            if agent.path and not can_exit(agent.x, agent.y):
+                self.path_index.remove(agent)
+                if self.cooperative:
+                    self.cooperative.release(agent)
+                agent.path = Path.empty(self.game_map.cols, self.game_map.grid_size)
+        self.path_index.avoided += len(self.agents) - len(replan)
+        return replan
+
+    def remove_agent(self, agent):
+        self.agents.remove(agent)
+        self.path_index.remove(agent)
+        if self.cooperative:
+            self.cooperative.forget(agent)
+        if self.scheduler is not None:
+            self.scheduler.discard(agent)
+
+    def step(self):
+        self.tick += 1
+        game_map = self.game_map
+        if self.map_watcher:
+            self.map_watcher.poll()
+        if self.sensors:
+            self.sensors.apply(game_map)
+
+        if self.tick % self.fire_spread_interval == 0:
+            game_map.spawn_new_fires(self.fire_spread_probability, self.random)
+        # new_fires also holds cells ignited by hand since the previous tick
+        new_fires = game_map.new_fires
+        game_map.new_fires = []
+        if self.hazard:
+            self.hazard.step()
+
+        self.update_fire_arrival(new_fires)
+        self.path_index.invalidate((fire.x, fire.y) for fire in new_fires)
+        retargeted = []
+        if self.exit_assigner and (self.tick - 1) % ASSIGNMENT_INTERVAL == 0:
+            targets = [agent.target_exit for agent in self.agents]
+            self.exit_assigner.update(self.agents)
+            retargeted = [agent for agent, target in zip(self.agents, targets) if agent.target_exit is not target]
+        self.plan(self.agents_to_replan(retargeted))
+        if self.sensors:
+            self.sensors.routed(len(self.scheduler) if self.scheduler is not None else 0)
+
+        exited = []
+        dead = []
+        moving = self.tick % self.agent_move_interval == 0
+        if moving:
+            self.moves += 1
+        agents = self.agents[:]
+        # One gather from the hazard field for everyone instead of a fire lookup per agent
+        damage = self.hazard.damage(agents) if self.hazard else None
+        for i, agent in enumerate(agents):
+            agent.previous = (agent.x, agent.y)
+            if any(exit_door.check_collision(agent) for exit_door in game_map.exit_doors):
+                self.remove_agent(agent)
+                exited.append(agent)
+                continue
+            if damage is not None:
+                agent.health -= damage[i]
+            elif agent.path and game_map.fire_positions.burning(agent.path.next_cell()):
+                agent.health -= FIRE_DAMAGE
+            if agent.health <= 0:
+                self.remove_agent(agent)
+                dead.append(agent)
+                continue
+            if moving and agent.path:
+                agent.move()
+                self.path_index.discard(agent, (agent.x, agent.y))
+
+        self.saved += len(exited)
+        self.lost += len(dead)
+        return Tick(self.tick, self.agents, new_fires, exited, dead)
+
+    def trapped(self):
+        # Agents walled off from every exit: they can neither leave nor walk into the fire
+        can_exit = self.connectivity.can_exit
+        return [agent for agent in self.agents if not can_exit(agent.x, agent.y)]
+
+    def finished(self):
+        # Nobody left who can still reach an exit; a watched map file may yet open a way out
+        if self.map_watcher:
+            return not self.agents
+        can_exit = self.connectivity.can_exit
+        return not any(can_exit(agent.x, agent.y) for agent in self.agents)
+
+    def run(self, max_ticks=None):
+        while not self.finished() and (max_ticks is None or self.tick < max_ticks):
+            yield self.step()
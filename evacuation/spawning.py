@@ -0,0 +1,76 @@
+import heapq
+import itertools
+from array import array
+
+
+class FreeCellIndex:
+    # Flat indices of every cell an agent may start on, built once per map and fire state.
+    # Sampling draws all agents in a single call instead of rejection-testing random cells.
+    def __init__(self, game_map):
+        self.game_map = game_map
+        walls = game_map.walls
+        burning = game_map.fire_positions
+        size = game_map.grid_size
+        cols = game_map.cols
+        self.cells = array('i', (
+            cell for cell in range(game_map.rows * cols)
+            if (cell % cols * size, cell // cols * size) not in walls
+            and not burning.burning(cell)
+        ))
+
+    def __len__(self):
+        return len(self.cells)
+
+    def position(self, cell):
+        row, col = divmod(cell, self.game_map.cols)
+        return col * self.game_map.grid_size, row * self.game_map.grid_size
+
+    def sample(self, n, rng, density=None, replace=True):
+        # density, when given, is a per-cell weight indexed like the map (see room_density)
+        if not replace and n > len(self.cells):
+            raise ValueError(f"cannot place {n} agents on {len(self.cells)} free cells without replacement")
+        weights = None
+        if density is not None:
+            weights = [density[cell] for cell in self.cells]
+            if not any(weight > 0 for weight in weights):
+                raise ValueError("density map gives no weight to any free cell")
+
+        if hasattr(rng, 'integers'):
+            # numpy.random.Generator: one vectorized draw
+            p = None
+            if weights is not None:
+                total = sum(weights)
+                p = [weight / total for weight in weights]
+            return rng.choice(self.cells, size=n, replace=replace, p=p).tolist()
+
+        if replace:
+            cum_weights = list(itertools.accumulate(weights)) if weights is not None else None
+            return rng.choices(self.cells, cum_weights=cum_weights, k=n)
+        if weights is None:
+            return rng.sample(self.cells, n)
+        # Weighted sampling without replacement (Efraimidis-Spirakis): keep the n largest u ** (1 / w)
+        keyed = ((rng.random() ** (1 / weight), cell) for cell, weight in zip(self.cells, weights) if weight > 0)
+        chosen = heapq.nlargest(n, keyed)
+        if len(chosen) < n:
+            raise ValueError(f"density map only covers {len(chosen)} free cells, {n} agents requested")
+        return [cell for _, cell in chosen]
+
+
+def room_density(game_map, rooms, default=0.0):
+    # rooms: [{"x", "y", "width", "height", "weight"}] in pixels, as stored under "rooms" in a map
+    # file. A room's weight is its expected occupancy, spread evenly over its cells.
+    size = game_map.grid_size
+    density = [default] * (game_map.rows * game_map.cols)
+    for room in rooms:
+        cols = range(room['x'] // size, min((room['x'] + room['width']) // size, game_map.cols))
+        rows = range(room['y'] // size, min((room['y'] + room['height']) // size, game_map.rows))
+        cells = [row * game_map.cols + col for row in rows for col in cols]
+        for cell in cells:
+            density[cell] += room.get('weight', 1.0) / len(cells)
+    return density
+
+
+def choose_colors(rng, colors, n):
+    if hasattr(rng, 'integers'):
+        return [colors[i] for i in rng.integers(len(colors), size=n)]
+    return rng.choices(colors, k=n)
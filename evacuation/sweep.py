@@ -0,0 +1,148 @@
+import os
+import csv
+import sys
+import json
+import hashlib
+import argparse
+import functools
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .trajectory import parse_ignition
+from .simulation import SCREEN_WIDTH, SCREEN_HEIGHT, FIRE_SPREAD_PROBABILITY, NUM_AGENTS, GRID_SIZE, MAX_TICKS
+
+CACHE_DIR = ".sweep_cache"
+# Bump when the simulation changes in a way that makes cached results stale
+SWEEP_VERSION = 2
+
+RESULT_FIELDS = ['saved', 'lost', 'remaining', 'trapped', 'ticks', 'replans']
+
+
+def expand_grid(maps, spreads, agents, grid_sizes, ignitions, seeds, max_ticks, cooperative=False, hazard=False):
+    for map_file, spread, num_agents, grid_size, ignition, seed in itertools.product(
+            maps, spreads, agents, grid_sizes, ignitions, seeds):
+        yield {
+            'map': map_file,
+            'spread': spread,
+            'agents': num_agents,
+            'grid_size': grid_size,
+            'ignition': ignition,
+            'seed': seed,
+            'max_ticks': max_ticks,
+            'cooperative': cooperative,
+            'hazard': hazard,
+        }
+
+
+@functools.lru_cache(maxsize=None)
+def file_digest(path):
+    with open(path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def case_key(case):
+    # Identified by what the map file contains, not where it lives, so renames still hit the cache
+    keyed = dict(case, map=file_digest(case['map']), version=SWEEP_VERSION)
+    return hashlib.sha256(json.dumps(keyed, sort_keys=True).encode()).hexdigest()
+
+
+def run_case(case):
+    from .simulation import Map, Simulation, spawn_agents
+
+    game_map = Map(case['grid_size'], SCREEN_WIDTH, SCREEN_HEIGHT, case['map'])
+    size = case['grid_size']
+    for x, y in case['ignition']:
+        game_map.add_fire_at_position(x // size * size, y // size * size)
+    simulation = Simulation(game_map, seed=case['seed'], fire_spread_probability=case['spread'],
+                            cooperative=case['cooperative'], hazard=case['hazard'])
+    simulation.agents = spawn_agents(game_map, case['agents'], simulation.random)
+    for _ in simulation.run(case['max_ticks']):
+        pass
+    return {
+        'saved': simulation.saved,
+        'lost': simulation.lost,
+        'remaining': len(simulation.agents),
+        'trapped': len(simulation.trapped()),
+        'ticks': simulation.tick,
+        'replans': simulation.path_index.replans,
+    }
+
+
+def load_cached(cache_dir, key):
+    try:
+        with open(os.path.join(cache_dir, f"{key}.json")) as file:
+            return json.load(file)['result']
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return None
+
+
+def store_cached(cache_dir, key, case, result):
+    path = os.path.join(cache_dir, f"{key}.json")
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, 'w') as file:
+        json.dump({'case': case, 'result': result}, file)
+    os.replace(temporary, path)
+
+
+def sweep(cases, cache_dir=CACHE_DIR, workers=None):
+    # Yields (case, result, cached) as results become available; only uncached cases are run
+    os.makedirs(cache_dir, exist_ok=True)
+    pending = {}
+    for case in cases:
+        key = case_key(case)
+        result = load_cached(cache_dir, key)
+        if result is not None:
+            yield case, result, True
+        else:
+            pending[key] = case
+    if not pending:
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_case, case): key for key, case in pending.items()}
+        for future in as_completed(futures):
+            key = futures[future]
+            result = future.result()
+            store_cached(cache_dir, key, pending[key], result)
+            yield pending[key], result, False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a grid of headless evacuation simulations.")
+    parser.add_argument('--map', nargs='+', default=['map.json'], dest='maps')
+    parser.add_argument('--spread', nargs='+', type=float, default=[FIRE_SPREAD_PROBABILITY])
+    parser.add_argument('--agents', nargs='+', type=int, default=[NUM_AGENTS])
+    parser.add_argument('--grid-size', nargs='+', type=int, default=[GRID_SIZE])
+    parser.add_argument('--ignition', nargs='+', default=['400,300'],
+                        help="initial fires per run as 'x,y;x,y' (pixels), '' for none")
+    parser.add_argument('--seeds', nargs='+', type=int, default=[0])
+    parser.add_argument('--max-ticks', type=int, default=MAX_TICKS)
+    parser.add_argument('--cooperative', action='store_true', help="plan agents around each other (WHCA*)")
+    parser.add_argument('--hazard', action='store_true', help="damage agents from a diffusing smoke field (NumPy)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument('--cache', default=CACHE_DIR)
+    parser.add_argument('--output', default=None, help="CSV file for the results (default: stdout)")
+    args = parser.parse_args()
+
+    cases = list(expand_grid(args.maps, args.spread, args.agents, args.grid_size,
+                             [parse_ignition(text) for text in args.ignition], args.seeds, args.max_ticks,
+                             args.cooperative, args.hazard))
+
+    output = open(args.output, 'w', newline='') if args.output else sys.stdout
+    writer = csv.writer(output)
+    writer.writerow(['map', 'spread', 'agents', 'grid_size', 'ignition', 'seed', 'max_ticks', 'cooperative', 'hazard'] +
+                    RESULT_FIELDS)
+    computed = 0
+    for case, result, cached in sweep(cases, args.cache, args.workers):
+        computed += not cached
+        ignition = ';'.join(f"{x},{y}" for x, y in case['ignition'])
+        writer.writerow([case['map'], case['spread'], case['agents'], case['grid_size'], ignition, case['seed'],
+                         case['max_ticks'], case['cooperative'], case['hazard']] + [result[field] for field in RESULT_FIELDS])
+        output.flush()
+    if args.output:
+        output.close()
+    print(f"{len(cases)} runs, {computed} computed, {len(cases) - computed} from cache", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+import sys
+import random
+import multiprocessing
+from multiprocessing import shared_memory
+
+from .routing import neighbors
+from .paths import Path
+from .path_index import PathIndex
+from .connectivity import ConnectivityIndex
+from .simulation import (
+    FIRE_SPREAD_PROBABILITY, FIRE_SPREAD_INTERVAL, AGENT_MOVE_INTERVAL, FIRE_DAMAGE, GRID_SIZE, SCREEN_WIDTH,
+    SCREEN_HEIGHT, NUM_AGENTS, MAX_TICKS, Fire, Map, Tick, calculate_astar, spawn_agents,
+)
+
+
+class LayerView:
+    # Read-only (x, y) membership test over a one-byte-per-cell layer in shared memory, standing in
+    # for Map.walls and Map.fire_positions inside a worker
+    def __init__(self, buffer, cols, rows, grid_size):
+        self.buffer = buffer
+        self.cols = cols
+        self.rows = rows
+        self.grid_size = grid_size
+
+    def __contains__(self, position):
+        col, row = position[0] // self.grid_size, position[1] // self.grid_size
+        return 0 <= col < self.cols and 0 <= row < self.rows and self.buffer[row * self.cols + col] != 0
+
+
+class Tile:
+    # One rectangle of the grid, run inside a worker process. It spreads fire into its own cells,
+    # reading the one-cell halo around it from the shared fire layer, and steps the agents that
+    # currently stand in it. Agents that step out are handed back to be migrated.
+    def __init__(self, spec, walls, fires):
+        self.index = spec['index']
+        self.col_range = spec['cols']
+        self.row_range = spec['rows']
+        self.cols = spec['grid_cols']
+        self.rows = spec['grid_rows']
+        self.grid_size = spec['grid_size']
+        self.seed = spec['seed']
+        self.fire_spread_probability = spec['fire_spread_probability']
+        self.walls = walls
+        self.fires = fires
+        # Enough of a Map for calculate_astar, backed by the shared layers
+        self.width = spec['width']
+        self.height = spec['height']
+        self.exit_doors = spec['exit_doors']
+        self.fire_positions = LayerView(fires, self.cols, self.rows, self.grid_size)
+        self.wall_view = LayerView(walls, self.cols, self.rows, self.grid_size)
+        self.agents = []
+        self.path_index = PathIndex()
+        self.front = {}
+        self.add_fires(spec['burning'])
+
+    def owns(self, cell):
+        row, col = divmod(cell, self.cols)
+        return self.col_range[0] <= col < self.col_range[1] and self.row_range[0] <= row < self.row_range[1]
+
+    def owns_position(self, x, y):
+        return self.owns((y // self.grid_size) * self.cols + x // self.grid_size)
+
+    def near(self, cell):
+        # Own cells plus the halo ring, the only burning cells that can spread into this tile
+        row, col = divmod(cell, self.cols)
+        return (self.col_range[0] - 1 <= col <= self.col_range[1]
+                and self.row_range[0] - 1 <= row <= self.row_range[1])
+
+    def add_fires(self, cells):
+        for cell in cells:
+            if self.near(cell):
+                self.front[cell] = None
+
+    def spread(self, tick):
+        # Every unburned cell with k burning neighbours ignites with 1 - (1 - p) ** k, the same odds as
+        # one draw per neighbour, but decided by the tile that owns the cell so no two tiles write it.
+        # The generator is derived from (seed, tick, tile), so results do not depend on scheduling.
+        counts = {}
+        retired = []
+        walls, fires = self.walls, self.fires
+        for cell in self.front:
+            found = False
+            for neighbor in neighbors(cell, self.cols, self.rows):
+                if self.owns(neighbor) and not fires[neighbor] and not walls[neighbor]:
+                    counts[neighbor] = counts.get(neighbor, 0) + 1
+                    found = True
+            if not found:
+                retired.append(cell)
+        for cell in retired:
+            del self.front[cell]
+
+        rng = random.Random(f"{self.seed}:{tick}:{self.index}")
+        miss = 1 - self.fire_spread_probability
+        return [cell for cell in sorted(counts) if rng.random() < 1 - miss ** counts[cell]]
+
+    def step_agents(self, moving, ignited, walls, arrivals, trapped):
+        positions = [((cell % self.cols) * self.grid_size, (cell // self.cols) * self.grid_size) for cell in ignited]
+        self.add_fires(ignited)
+        self.path_index.invalidate(positions)
+        self.path_index.invalidate(walls)
+        for agent in arrivals:
+            self.agents.append(agent)
+            self.path_index.set_path(agent, [], agent.path)
+
+        affected = self.path_index.take_affected()
+        view = TileMapView(self)
+        for agent in self.agents:
+            if agent.id in trapped:
+                # Walled off from every exit: no route to plan, and an old one leads into a wall
+                if agent.path:
+                    self.path_index.remove(agent)
+                    agent.path = Path.empty(self.cols, self.grid_size)
+                continue
+            if not agent.path or agent in affected:
+                _, path = calculate_astar(agent, view)
+                self.path_index.set_path(agent, agent.path, path)
+                agent.path = path
+
+        states, exited, dead, leaving = [], [], [], []
+        for agent in self.agents[:]:
+            agent.previous = (agent.x, agent.y)
+            if any(exit_door.check_collision(agent) for exit_door in self.exit_doors):
+                self.remove(agent)
+                exited.append(agent.id)
+                continue
+            if agent.path and agent.path[0] in self.fire_positions:
+                agent.health -= FIRE_DAMAGE
+                if agent.health <= 0:
+                    self.remove(agent)
+                    dead.append((agent.id, agent.health))
+                    continue
+            if moving and agent.path:
+                agent.move()
+                self.path_index.discard(agent, (agent.x, agent.y))
+            states.append((agent.id, agent.x, agent.y, agent.health))
+            if not self.owns_position(agent.x, agent.y):
+                self.remove(agent)
+                leaving.append(agent)
+        return states, exited, dead, leaving
+
+    def remove(self, agent):
+        self.agents.remove(agent)
+        self.path_index.remove(agent)
+
+
+class TileMapView:
+    # The attributes calculate_astar reads from a Map
+    def __init__(self, tile):
+        self.grid_size = tile.grid_size
+        self.width = tile.width
+        self.height = tile.height
+        self.exit_doors = tile.exit_doors
+        self.walls = tile.wall_view
+        self.fire_positions = tile.fire_positions
+
+
+def run_tile(conn, spec):
+    walls_memory = shared_memory.SharedMemory(name=spec['walls'])
+    fires_memory = shared_memory.SharedMemory(name=spec['fires'])
+    tile = Tile(spec, walls_memory.buf, fires_memory.buf)
+    try:
+        while True:
+            message = conn.recv()
+            if message[0] == 'spread':
+                _, tick, external = message
+                tile.add_fires(external)
+                conn.send(tile.spread(tick))
+            elif message[0] == 'agents':
+                _, moving, ignited, walls, arrivals, trapped = message
+                conn.send(tile.step_agents(moving, ignited, walls, arrivals, trapped))
+            else:
+                break
+    finally:
+        tile = None
+        walls_memory.close()
+        fires_memory.close()
+        conn.close()
+
+
+def split(length, parts):
+    bounds = [length * i // parts for i in range(parts + 1)]
+    return list(zip(bounds, bounds[1:]))
+
+
+class TiledSimulation:
+    # Simulation split into tiles_x * tiles_y spatial tiles, each stepped by its own worker
+    # process. Walls and fire live in shared memory, one byte per cell, written only here between
+    # the two phases of a tick: workers spread fire into their own cells (reading halo cells from
+    # the shared layer), the new fires are published, then workers plan, damage and move their
+    # agents and return the ones that crossed into another tile. game_map is kept current, so
+    # renderers and trajectory sinks work as with Simulation. Routes ignore fire arrival times.
+    # Connectivity is kept here, on the whole map, and the tiles are told which agents are trapped.
+    def __init__(self, game_map, agents=None, tiles=(2, 2), seed=None,
+                 fire_spread_probability=FIRE_SPREAD_PROBABILITY, fire_spread_interval=FIRE_SPREAD_INTERVAL,
+                 agent_move_interval=AGENT_MOVE_INTERVAL):
+        self.game_map = game_map
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.fire_spread_interval = fire_spread_interval
+        self.agent_move_interval = agent_move_interval
+        self.tick = 0
+        self.saved = 0
+        self.lost = 0
+        self.agents = []
+        self.by_id = {}
+        self.new_walls = []
+        # Burning cells next to a removed wall, sent back to the tiles' fronts
+        self.rekindled = []
+        game_map.wall_listeners.append(self)
+        self.connectivity = ConnectivityIndex(game_map)
+        game_map.wall_listeners.append(self.connectivity)
+
+        cols, rows = game_map.cols, game_map.rows
+        size = cols * rows
+        self.walls_memory = shared_memory.SharedMemory(create=True, size=size)
+        self.fires_memory = shared_memory.SharedMemory(create=True, size=size)
+        self.walls = self.walls_memory.buf
+        self.fires = self.fires_memory.buf
+        for x, y in game_map.walls:
+            if game_map.in_bounds(x, y):
+                self.walls[(y // game_map.grid_size) * cols + x // game_map.grid_size] = 1
+        burning = [game_map.fire_positions.cell(x, y) for x, y in game_map.fire_positions]
+        for cell in burning:
+            self.fires[cell] = 1
+        # Fires already reported to the workers through the initial spec
+        game_map.new_fires = []
+
+        self.col_bounds = split(cols, tiles[0])
+        self.row_bounds = split(rows, tiles[1])
+        self.connections = []
+        self.workers = []
+        for index in range(tiles[0] * tiles[1]):
+            row_index, col_index = divmod(index, tiles[0])
+            spec = {
+                'index': index, 'cols': self.col_bounds[col_index], 'rows': self.row_bounds[row_index],
+                'grid_cols': cols, 'grid_rows': rows, 'grid_size': game_map.grid_size,
+                'width': game_map.width, 'height': game_map.height, 'exit_doors': game_map.exit_doors,
+                'seed': self.seed, 'fire_spread_probability': fire_spread_probability, 'burning': burning,
+                'walls': self.walls_memory.name, 'fires': self.fires_memory.name,
+            }
+            parent, child = multiprocessing.Pipe()
+            worker = multiprocessing.Process(target=run_tile, args=(child, spec), daemon=True)
+            worker.start()
+            child.close()
+            self.connections.append(parent)
+            self.workers.append(worker)
+
+        self.arrivals = [[] for _ in self.connections]
+        for agent in agents or []:
+            self.add_agent(agent)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def tile_of(self, x, y):
+        col, row = x // self.game_map.grid_size, y // self.game_map.grid_size
+        col_index = next(i for i, (start, end) in enumerate(self.col_bounds) if start <= col < end)
+        row_index = next(i for i, (start, end) in enumerate(self.row_bounds) if start <= row < end)
+        return row_index * len(self.col_bounds) + col_index
+
+    def add_agent(self, agent):
+        # The worker gets the agent itself; this process keeps a mirror for drawing and output
+        if agent.id is None:
+            agent.id = len(self.by_id)
+        self.arrivals[self.tile_of(agent.x, agent.y)].append(agent)
+        mirror = type(agent)(agent.x, agent.y, agent.size, agent.speed, agent.color, agent.health, agent.id)
+        self.agents.append(mirror)
+        self.by_id[agent.id] = mirror
+
+    def add_wall(self, x, y):
+        size = self.game_map.grid_size
+        self.walls[(y // size) * self.game_map.cols + x // size] = 1
+        self.new_walls.append((x, y))
+
+    def remove_wall(self, x, y):
+        size = self.game_map.grid_size
+        cell = (y // size) * self.game_map.cols + x // size
+        self.walls[cell] = 0
+        self.rekindled += [neighbor for neighbor in neighbors(cell, self.game_map.cols, self.game_map.rows)
+                           if self.fires[neighbor]]
+
+    def step(self):
+        self.tick += 1
+        game_map = self.game_map
+        fire_state = game_map.fire_positions
+
+        # Cells set alight by hand since the last tick are already in game_map; publish them first
+        external = [fire_state.cell(fire.x, fire.y) for fire in game_map.new_fires]
+        for cell in external:
+            self.fires[cell] = 1
+        # Already burning, but back on the front now that a wall next to them is gone
+        external += self.rekindled
+        self.rekindled = []
+        new_fires = game_map.new_fires
+        game_map.new_fires = []
+
+        ignited = list(external)
+        if self.tick % self.fire_spread_interval == 0:
+            for connection in self.connections:
+                connection.send(('spread', self.tick, external))
+            spread = [cell for connection in self.connections for cell in connection.recv()]
+            for cell in spread:
+                self.fires[cell] = 1
+                fire_state.ignite(cell)
+                x, y = fire_state.position(cell)
+                new_fires.append(Fire(x, y, game_map.grid_size))
+            ignited += spread
+
+        moving = self.tick % self.agent_move_interval == 0
+        walls, self.new_walls = self.new_walls, []
+        trapped = {agent.id for agent in self.trapped()}
+        for connection, arrivals in zip(self.connections, self.arrivals):
+            connection.send(('agents', moving, ignited, walls, arrivals, trapped))
+        self.arrivals = [[] for _ in self.connections]
+
+        exited, dead = [], []
+        for connection in self.connections:
+            states, exited_ids, dead_ids, leaving = connection.recv()
+            for agent_id, x, y, health in states:
+                mirror = self.by_id[agent_id]
+                mirror.previous = (mirror.x, mirror.y)
+                mirror.x, mirror.y, mirror.health = x, y, health
+            for agent_id in exited_ids:
+                exited.append(self.by_id.pop(agent_id))
+            for agent_id, health in dead_ids:
+                mirror = self.by_id.pop(agent_id)
+                mirror.health = health
+                dead.append(mirror)
+            for agent in leaving:
+                self.arrivals[self.tile_of(agent.x, agent.y)].append(agent)
+        if exited or dead:
+            self.agents = [agent for agent in self.agents if agent.id in self.by_id]
+
+        self.saved += len(exited)
+        self.lost += len(dead)
+        return Tick(self.tick, self.agents, new_fires, exited, dead)
+
+    def trapped(self):
+        can_exit = self.connectivity.can_exit
+        return [agent for agent in self.agents if not can_exit(agent.x, agent.y)]
+
+    def finished(self):
+        can_exit = self.connectivity.can_exit
+        return not any(can_exit(agent.x, agent.y) for agent in self.agents)
+
+    def run(self, max_ticks=None):
+        while not self.finished() and (max_ticks is None or self.tick < max_ticks):
+            yield self.step()
+
+    def close(self):
+        if not self.connections:
+            return
+        for connection in self.connections:
+            connection.send(('stop',))
+            connection.close()
+        for worker in self.workers:
+            worker.join()
+        self.connections = []
+        self.walls.release()
+        self.fires.release()
+        self.walls_memory.close()
+        self.fires_memory.close()
+        self.walls_memory.unlink()
+        self.fires_memory.unlink()
+        for listener in (self, self.connectivity):
+            if listener in self.game_map.wall_listeners:
+                self.game_map.wall_listeners.remove(listener)
+
+
+def main():
+    import time
+
+    if len(sys.argv) < 2:
+        print("Usage: python -m evacuation.tiles MAP_FILE [NUM_AGENTS] [TILES_X] [TILES_Y] [SEED] [MAX_TICKS]")
+        sys.exit(1)
+    map_file = sys.argv[1]
+    num_agents = int(sys.argv[2]) if len(sys.argv) > 2 else NUM_AGENTS
+    tiles = (int(sys.argv[3]) if len(sys.argv) > 3 else 2, int(sys.argv[4]) if len(sys.argv) > 4 else 2)
+    seed = int(sys.argv[5]) if len(sys.argv) > 5 else 0
+    max_ticks = int(sys.argv[6]) if len(sys.argv) > 6 else MAX_TICKS
+
+    try:
+        game_map = Map(GRID_SIZE, SCREEN_WIDTH, SCREEN_HEIGHT, map_file)
+    except ValueError as error:
+        print(f"Error: {error}")
+        sys.exit(1)
+    game_map.add_fire_at_position(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
+    agents = spawn_agents(game_map, num_agents, random.Random(seed))
+    start = time.perf_counter()
+    with TiledSimulation(game_map, agents, tiles, seed) as simulation:
+        for _ in simulation.run(max_ticks):
+            pass
+    elapsed = time.perf_counter() - start
+    print(f"Saved: {simulation.saved}  Lost: {simulation.lost}  Trapped: {len(simulation.trapped())}  "
+          f"Remaining: {len(simulation.agents)}  "
+          f"Ticks: {simulation.tick} ({simulation.tick / elapsed:.1f}/s on {tiles[0] * tiles[1]} tiles)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+import os
+import csv
+import sys
+import json
+
+from .simulation import GRID_SIZE, MAX_TICKS, NUM_AGENTS, SCREEN_WIDTH, SCREEN_HEIGHT, Map, Simulation, spawn_agents
+
+FIELDS = ['type', 'tick', 'id', 'x', 'y', 'health', 'status']
+
+
+def parse_ignition(text):
+    # "300,300;600,100" -> [[300, 300], [600, 100]]; an empty string means no initial fire
+    points = []
+    for point in filter(None, text.split(';')):
+        x, y = point.split(',')
+        points.append([int(x), int(y)])
+    return points
+
+
+def tick_records(tick):
+    # One record per live agent, one per agent that left this tick and one per newly burning cell
+    for agent in tick.agents:
+        yield {'type': 'agent', 'tick': tick.number, 'id': agent.id, 'x': agent.x, 'y': agent.y,
+               'health': agent.health, 'status': 'active'}
+    for status, agents in (('exited', tick.exited), ('dead', tick.dead)):
+        for agent in agents:
+            yield {'type': 'agent', 'tick': tick.number, 'id': agent.id, 'x': agent.x, 'y': agent.y,
+                   'health': agent.health, 'status': status}
+    for fire in tick.new_fires:
+        yield {'type': 'fire', 'tick': tick.number, 'id': None, 'x': fire.x, 'y': fire.y,
+               'health': None, 'status': 'burning'}
+
+
+def stream_records(ticks):
+    for tick in ticks:
+        yield from tick_records(tick)
+
+
+class NDJSONSink:
+    def __init__(self, path):
+        self.file = open(path, 'w')
+
+    def write(self, records):
+        for record in records:
+            self.file.write(json.dumps(record, separators=(',', ':')))
+            self.file.write('\n')
+
+    def close(self):
+        self.file.close()
+
+
+class CSVSink:
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=FIELDS)
+        self.writer.writeheader()
+
+    def write(self, records):
+        self.writer.writerows(records)
+
+    def close(self):
+        self.file.close()
+
+
+class ColumnarSink:
+    # Buffers at most chunk_size rows and writes each full chunk as its own .npz file
+    def __init__(self, path, chunk_size=65536):
+        import numpy as np
+
+        self.np = np
+        self.directory = path
+        self.chunk_size = chunk_size
+        self.chunk_index = 0
+        os.makedirs(path, exist_ok=True)
+        self.columns = {field: [] for field in FIELDS}
+
+    def write(self, records):
+        columns = self.columns
+        for record in records:
+            for field in FIELDS:
+                columns[field].append(record[field])
+            if len(columns['tick']) >= self.chunk_size:
+                self.flush()
+
+    def flush(self):
+        np = self.np
+        columns = self.columns
+        if not columns['tick']:
+            return
+        chunk = {
+            'type': np.array(columns['type']),
+            'status': np.array(columns['status']),
+            'tick': np.array(columns['tick'], dtype=np.int64),
+            'id': np.array([-1 if v is None else v for v in columns['id']], dtype=np.int64),
+            'x': np.array(columns['x'], dtype=np.int32),
+            'y': np.array(columns['y'], dtype=np.int32),
+            'health': np.array([np.nan if v is None else v for v in columns['health']], dtype=np.float32),
+        }
+        np.savez(os.path.join(self.directory, f"chunk-{self.chunk_index:06d}.npz"), **chunk)
+        self.chunk_index += 1
+        self.columns = {field: [] for field in FIELDS}
+
+    def close(self):
+        self.flush()
+
+
+STORE_SUFFIX = '.traj'
+STORE_VERSION = 1
+# Status codes in a TrajectoryStore row; an agent slot that was never filled stays ABSENT
+STATUS_CODES = {'absent': 0, 'active': 1, 'exited': 2, 'dead': 3}
+
+
+def store_dtype():
+    import numpy as np
+
+    return np.dtype([('x', '<i4'), ('y', '<i4'), ('health', '<f4'), ('status', 'u1')])
+
+
+class StoreSink:
+    # Writes a TrajectoryStore directory: one fixed-width row of agent states per tick, indexed by
+    # agent id, so a tick is one contiguous block and an agent's track one strided column. Rows are
+    # appended as they complete; the width is the number of agents seen in the first tick.
+    def __init__(self, path, num_agents=None):
+        import numpy as np
+
+        self.np = np
+        self.directory = path
+        self.num_agents = num_agents
+        os.makedirs(path, exist_ok=True)
+        self.states = open(os.path.join(path, 'states.bin'), 'wb')
+        self.ticks = open(os.path.join(path, 'ticks.bin'), 'wb')
+        self.fires = open(os.path.join(path, 'fires.bin'), 'wb')
+        self.fire_offsets = open(os.path.join(path, 'fire_offsets.bin'), 'wb')
+        self.fire_count = 0
+        self.tick = None
+        self.rows = []
+        self.new_fires = []
+
+    def write(self, records):
+        for record in records:
+            if record['tick'] != self.tick:
+                self.flush()
+                self.tick = record['tick']
+            if record['type'] == 'fire':
+                self.new_fires.append((record['x'], record['y']))
+            else:
+                self.rows.append((record['id'], record['x'], record['y'], record['health'],
+                                  STATUS_CODES[record['status']]))
+
+    def flush(self):
+        np = self.np
+        if self.tick is None:
+            return
+        if self.num_agents is None:
+            self.num_agents = max((row[0] for row in self.rows), default=-1) + 1
+            with open(os.path.join(self.directory, 'meta.json'), 'w') as file:
+                json.dump({'version': STORE_VERSION, 'agents': self.num_agents}, file)
+
+        row = np.zeros(self.num_agents, dtype=store_dtype())
+        if self.rows:
+            ids, xs, ys, health, status = zip(*self.rows)
+            if max(ids) >= self.num_agents:
+                raise ValueError(f"agent id {max(ids)} does not fit a store of {self.num_agents} agents")
+            row['x'][list(ids)] = xs
+            row['y'][list(ids)] = ys
+            row['health'][list(ids)] = health
+            row['status'][list(ids)] = status
+        self.states.write(row.tobytes())
+        self.ticks.write(np.int64(self.tick).tobytes())
+        self.fires.write(np.array(self.new_fires, dtype='<i4').tobytes())
+        self.fire_count += len(self.new_fires)
+        self.fire_offsets.write(np.int64(self.fire_count).tobytes())
+        self.rows = []
+        self.new_fires = []
+
+    def close(self):
+        self.flush()
+        self.tick = None
+        for file in (self.states, self.ticks, self.fires, self.fire_offsets):
+            file.close()
+
+
+class TrajectoryStore:
+    # Read side of a StoreSink directory. Everything is memory-mapped, so opening a run of any size
+    # is instant and each lookup only pages in the bytes it touches; snapshots, tracks and fire
+    # prefixes are NumPy views into the files, not copies.
+    def __init__(self, path):
+        import numpy as np
+
+        with open(os.path.join(path, 'meta.json')) as file:
+            meta = json.load(file)
+        if meta.get('version') != STORE_VERSION:
+            raise ValueError(f"{path} is a version {meta.get('version')} trajectory store")
+        self.num_agents = meta['agents']
+
+        def mapped(name, dtype, shape=None):
+            # np.memmap cannot map an empty file
+            file = os.path.join(path, name)
+            if os.path.getsize(file) == 0:
+                return np.zeros((0,) + (shape or ()), dtype=dtype)
+            data = np.memmap(file, dtype=dtype, mode='r')
+            return data.reshape((-1,) + shape) if shape else data
+
+        self.ticks = mapped('ticks.bin', '<i8')
+        self.states = mapped('states.bin', store_dtype(), (self.num_agents,))[:len(self.ticks)]
+        self.fires = mapped('fires.bin', '<i4', (2,))
+        self.fire_offsets = mapped('fire_offsets.bin', '<i8')
+
+    def __len__(self):
+        return len(self.ticks)
+
+    def row(self, tick):
+        # Position of a tick in the store; ticks that were not recorded resolve to the one before
+        import numpy as np
+
+        row = int(np.searchsorted(self.ticks, tick, side='right')) - 1
+        if row < 0:
+            raise KeyError(f"tick {tick} is before the first recorded tick")
+        return row
+
+    def snapshot(self, tick):
+        return self.states[self.row(tick)]
+
+    def track(self, agent_id):
+        return self.states[:, agent_id]
+
+    def fires_until(self, tick):
+        # Every cell that is burning by the end of the tick, as an (n, 2) view of x, y
+        return self.fires[:self.fire_offsets[self.row(tick)]]
+
+
+def open_sink(path, chunk_size=65536):
+    if path.endswith(STORE_SUFFIX):
+        return StoreSink(path)
+    if path.endswith('.csv'):
+        return CSVSink(path)
+    if path.endswith('.ndjson') or path.endswith('.jsonl'):
+        return NDJSONSink(path)
+    return ColumnarSink(path, chunk_size)
+
+
+def export(ticks, sink):
+    try:
+        sink.write(stream_records(ticks))
+    finally:
+        sink.close()
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python -m evacuation.trajectory MAP_FILE OUTPUT [NUM_AGENTS] [SEED] [MAX_TICKS] [IGNITION]")
+        print("IGNITION is x,y pixel points like \"300,300;600,100\", the centre by default, \"\" for no fire")
+        print("OUTPUT ending in .ndjson/.jsonl or .csv picks that format, .traj a memory-mapped TrajectoryStore,")
+        print("anything else is a directory of .npz chunks")
+        sys.exit(1)
+
+    map_file, output = sys.argv[1], sys.argv[2]
+    num_agents = int(sys.argv[3]) if len(sys.argv) > 3 else NUM_AGENTS
+    seed = int(sys.argv[4]) if len(sys.argv) > 4 else None
+    max_ticks = int(sys.argv[5]) if len(sys.argv) > 5 else MAX_TICKS
+    ignition = parse_ignition(sys.argv[6]) if len(sys.argv) > 6 else [[SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2]]
+
+    try:
+        game_map = Map(GRID_SIZE, SCREEN_WIDTH, SCREEN_HEIGHT, map_file)
+    except ValueError as error:
+        print(f"Error: {error}")
+        sys.exit(1)
+    for x, y in ignition:
+        game_map.add_fire_at_position(x // GRID_SIZE * GRID_SIZE, y // GRID_SIZE * GRID_SIZE)
+    simulation = Simulation(game_map, seed=seed)
+    simulation.agents = spawn_agents(game_map, num_agents, simulation.random)
+    export(simulation.run(max_ticks), open_sink(output))
+    print(f"Saved: {simulation.saved}  Lost: {simulation.lost}  Trapped: {len(simulation.trapped())}  "
+          f"Remaining: {len(simulation.agents)}  Ticks: {simulation.tick}")
+    print(f"Replans: {simulation.path_index.replans}  Avoided: {simulation.path_index.avoided}")
+
+
+if __name__ == "__main__":
+    main()
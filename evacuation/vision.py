@@ -0,0 +1,40 @@
+import json
+
+
+def load_floor_plan(filename, width, height):
+    import cv2
+
+    image = cv2.imread(filename, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return None
+    return cv2.resize(image, (width, height))
+
+
+def threshold_walls(image, threshold, grid_size):
+    # Every grid cell whose top-left pixel is dark after thresholding becomes a wall
+    import cv2
+
+    _, binary_image = cv2.threshold(image, threshold, 255, cv2.THRESH_BINARY)
+    height, width = binary_image.shape[:2]
+    walls = set()
+    for y in range(0, height, grid_size):
+        for x in range(0, width, grid_size):
+            if binary_image[y, x] == 0:
+                walls.add((x, y))
+    return binary_image, walls
+
+
+def render_walls(walls, width, height, grid_size):
+    import cv2
+    import numpy as np
+
+    map_image = np.ones((height, width), dtype=np.uint8) * 255
+    for x, y in walls:
+        cv2.rectangle(map_image, (x, y), (x + grid_size, y + grid_size), 0, -1)
+    return map_image
+
+
+def save_walls(walls, filename):
+    wall_list = [{"x": x, "y": y} for x, y in walls]
+    with open(filename, "w") as f:
+        json.dump(wall_list, f, indent=4)
@@ -1,7 +1,4 @@
 import sys
-import cv2
-import json
-import numpy as np
 from PyQt6.QtWidgets import (
     QApplication,
     QMainWindow,
@@ -16,6 +13,8 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QImage, QPixmap
 
+from evacuation.vision import load_floor_plan, threshold_walls, render_walls, save_walls
+
 # Constants
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
@@ -71,11 +70,10 @@ class MapEditor(QMainWindow):
         file_dialog = QFileDialog()
         filename, _ = file_dialog.getOpenFileName(self, "Open Image", "", "Image Files (*.png *.jpg *.bmp)")
         if filename:
-            self.image = cv2.imread(filename, cv2.IMREAD_GRAYSCALE)
+            self.image = load_floor_plan(filename, SCREEN_WIDTH, SCREEN_HEIGHT)
             if self.image is None:
                 print("Error: Could not load image.")
                 return
-            self.image = cv2.resize(self.image, (SCREEN_WIDTH, SCREEN_HEIGHT))
             self.apply_threshold()
 
     def apply_threshold(self):
@@ -83,20 +81,11 @@ class MapEditor(QMainWindow):
             return
 
         threshold = self.slider.value()
-        _, binary_image = cv2.threshold(self.image, threshold, 255, cv2.THRESH_BINARY)
-
-        self.walls = set()
-        for y in range(0, SCREEN_HEIGHT, GRID_SIZE):
-            for x in range(0, SCREEN_WIDTH, GRID_SIZE):
-                if binary_image[y, x] == 0:
-                    self.walls.add((x, y))
+        binary_image, self.walls = threshold_walls(self.image, threshold, GRID_SIZE)
 
         self.update_image_label(binary_image, self.threshold_label)
 
-        map_image = np.ones((SCREEN_HEIGHT, SCREEN_WIDTH), dtype=np.uint8) * 255
-        for x, y in self.walls:
-            cv2.rectangle(map_image, (x, y), (x + GRID_SIZE, y + GRID_SIZE), 0, -1)
-
+        map_image = render_walls(self.walls, SCREEN_WIDTH, SCREEN_HEIGHT, GRID_SIZE)
         self.update_image_label(map_image, self.map_label)
 
     def update_image_label(self, image, label):
@@ -113,9 +102,7 @@ class MapEditor(QMainWindow):
         if not self.walls:
             print("No map to save.")
             return
-        wall_list = [{"x": x, "y": y} for x, y in self.walls]
-        with open("map.json", "w") as f:
-            json.dump(wall_list, f, indent=4)
+        save_walls(self.walls, "map.json")
         print("Map saved as 'map.json'")
 
 
@@ -1,310 +1,195 @@
 import pygame
 import sys
-import json
-import heapq
-import random
-from concurrent.futures import ThreadPoolExecutor
 
+from evacuation import trajectory
+from evacuation.clock import SimulationClock, TICK_MS
+from evacuation.pipeline import TickPipeline
+from evacuation.render import FrameRenderer
+from evacuation.sensors import SensorFeed
+from evacuation.simulation import (
+    SCREEN_WIDTH,
+    SCREEN_HEIGHT,
+    NUM_AGENTS,
+    GRID_SIZE,
+    AGENT_COLORS,
+    Map,
+    Simulation,
+    spawn_agents,
+)
 
-pygame.init()
 
-SCREEN_WIDTH = 800
-SCREEN_HEIGHT = 600
-
-WHITE = (255, 255, 255)
-BLACK = (0, 0, 0)
 BLUE = (0, 0, 255)
-GRAY = (200, 200, 200)
-GREEN=(0,255,0)
-RED = (255, 0, 0)
-ORANGE = (255, 165, 0)
-AGENT_COLORS = [(0, 128, 255), (0, 255, 128), (255, 0, 128), (128, 0, 255), (255, 128, 0)]
-
-NUM_AGENTS = 50
-GRID_SIZE = 10
-
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("AI Based Evacuation Simulation")
-
-class ExitDoor:
-    def __init__(self, x, y, size):
-        self.x = x
-        self.y = y
-        self.size = size
-
-    def draw(self, screen):
-        pygame.draw.rect(screen, BLACK, (self.x, self.y, self.size, self.size))
-
-    def check_collision(self, agent):
-        if (
-            agent.x < self.x + self.size
-            and agent.x + agent.size > self.x
-            and agent.y < self.y + self.size
-            and agent.y + agent.size > self.y
-        ):
-            return True
-        return False
-
-class Map:
-    def __init__(self, grid_size, screen_width, screen_height, map_file):
-        self.grid_size = grid_size
-        self.rows = screen_height // grid_size
-        self.cols = screen_width // grid_size
-        self.walls = self.load_map(map_file)
-        self.fires = []
-        self.exit_door = ExitDoor(screen_width - grid_size * 2, screen_height - grid_size * 2, grid_size)
-        self.fire_positions = set()
-        self.new_fires = []
-
-    def draw_exit_door(self, screen):
-        self.exit_door.draw(screen)
-
-    def load_map(self, map_file):
-        try:
-            with open(map_file, 'r') as file:
-                data = json.load(file)
-                return [(entry['x'], entry['y']) for entry in data]
-        except FileNotFoundError:
-            print(f"Error: {map_file} not found.")
-            sys.exit()
-        except json.JSONDecodeError:
-            print(f"Error: Invalid JSON format in {map_file}.")
-            sys.exit()
-
-    def spawn_new_fires(self):
-        new_fires = []
-        for fire in self.fires:
-            for dx, dy in [(-GRID_SIZE, 0), (GRID_SIZE, 0), (0, -GRID_SIZE), (0, GRID_SIZE)]:
-                new_x, new_y = fire.x + dx, fire.y + dy
-                if (0 <= new_x < SCREEN_WIDTH and 0 <= new_y < SCREEN_HEIGHT and
-                        (new_x, new_y) not in self.fire_positions and (new_x, new_y) not in self.walls):
-                    new_fires.append((new_x, new_y))
-
-        self.new_fires = []
-
-        for x, y in new_fires:
-            if (x, y) not in self.fire_positions and random.random() < 0.3:
-                self.new_fires.append(Fire(x, y, GRID_SIZE))
-                self.fires.append(Fire(x, y, GRID_SIZE))
-                self.fire_positions.add((x, y))
-
-
-    def draw_background(self, screen):
-        screen.fill(WHITE)
-
-    def draw_background_fence(self, screen):
-        for x in range(0, SCREEN_WIDTH, self.grid_size):
-            pygame.draw.line(screen, GRAY, (x, 0), (x, SCREEN_HEIGHT), 1)
-        for y in range(0, SCREEN_HEIGHT, self.grid_size):
-            pygame.draw.line(screen, GRAY, (0, y), (SCREEN_WIDTH, y), 1)
-
-
-    def draw_walls(self, screen):
-        for wall in self.walls:
-            pygame.draw.rect(screen, RED, (wall[0], wall[1], self.grid_size, self.grid_size))
-
-    def draw_fires(self, screen):
-        if self.new_fires is []:
-            return
-        for fire in self.new_fires:
-            pygame.draw.rect(screen, ORANGE, (fire.x, fire.y, self.grid_size, self.grid_size))
-
-
-    def add_fire_at_position(self, x, y):
-        if 0 <= x < SCREEN_WIDTH and 0 <= y < SCREEN_HEIGHT and (x, y) not in self.fire_positions:
-            self.fires.append(Fire(x, y, GRID_SIZE))
-            self.fire_positions.add((x, y))
-
-    def add_wall_at_position(self, x, y):
-        if 0 <= x < SCREEN_WIDTH and 0 <= y < SCREEN_HEIGHT:
-            if (x, y) not in self.walls and not any(f.x == x and f.y == y for f in self.fires):
-                self.walls.append((x, y))
-
-class Fire:
-    def __init__(self, x, y, size):
-        self.x = x
-        self.y = y
-        self.size = size
-
-    def draw(self, screen):
-        pygame.draw.rect(screen, ORANGE, (self.x, self.y, self.size, self.size))
-
-class Agent:
-    def __init__(self, x, y, size, speed, color):
-        self.x = x
-        self.y = y
-        self.size = size
-        self.speed = speed
-        self.color = color
-        self.path = []
-        self.health = 100
-
-    def move(self):
-        if self.path:
-            next_position = self.path.pop(0)
-            self.x, self.y = next_position
-
-    def draw(self, screen):
-        pygame.draw.rect(screen, self.color, (self.x, self.y, self.size, self.size))
-        # health_bar_width = self.size
-        # health_bar_height = 5
-        # health_percentage = self.health / 100
-        # pygame.draw.rect(screen, RED, (self.x, self.y - 10, health_bar_width, health_bar_height))
-        # pygame.draw.rect(screen, GREEN, (self.x, self.y - 10, health_bar_width * health_percentage, health_bar_height))
-    
-    def remove_draw(self, screen):
-        pygame.draw.rect(screen, WHITE, (self.x, self.y, self.size, self.size))
-
-def astar(start, goal, walls, fires, avoid_fire=True):
 
-    start_time = pygame.time.get_ticks()
+# 1.0 is real time (one tick per TICK_MS), 4.0 is 4x, None runs as fast as possible.
+# In the window: F toggles fast-forward, +/- double or halve the speed.
+SIMULATION_SPEED = 1.0
 
-    open_list = []
-    closed_list = set()
-    came_from = {}
+# Set to a .ndjson, .csv, .traj or directory path to stream every tick to disk
+TRAJECTORY_FILE = None
 
-    def heuristic(a, b):
-        # return abs(a[0] - b[0]) + abs(a[1] - b[1])
-        return ((a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2) ** 0.5
+# Set to a recorded .traj store to replay it instead of simulating.
+# Space pauses, Left/Right step one tick, Page Up/Down jump 100, drag the mouse to scrub.
+REPLAY_FILE = None
 
-    def nearest_fire_distance(position):
-        if not fires:
-            return 0
-        # return min(abs(position[0] - fire.x) + abs(position[1] - fire.y) for fire in fires)
-        # use euclidian distance
-        # return 0
-        return min(((position[0] - fire.x) ** 2 + (position[1] - fire.y) ** 2) ** 0.5 for fire in fires)
-        
-    g_score = {start: 0}
-    f_score = {start: heuristic(start, goal) - nearest_fire_distance(start)}
+# Plan agents around each other (WHCA*) so they queue at doors instead of overlapping
+COOPERATIVE_PLANNING = False
 
-    heapq.heappush(open_list, (f_score[start], start))
+# Milliseconds of route planning per tick; agents near the fire go first and the rest wait on a
+# quick interim route. Which agents fit depends on timing, so runs are no longer reproducible.
+# None plans every route in full each tick, however long that takes.
+PLANNING_BUDGET_MS = None
 
-    while open_list:
-        current_f, current = heapq.heappop(open_list)
-        if current == goal:
-            path = []
-            while current in came_from:
-                path.append(current)
-                current = came_from[current]
-            path.reverse()
-            return path
+# Apply edits saved to the map file (from map-maker.py or image-to-map.py) while the simulation runs
+WATCH_MAP_FILE = True
 
-        closed_list.add(current)
+# Fire events from building sensors: a file to tail, "-" for a pipe on stdin or "tcp://host:port".
+# One event per line, {"x": 300, "y": 200} or "300 200"; see evacuation/sensors.py.
+SENSOR_FEED = None
 
-
-        for neighbor in [(0, -GRID_SIZE), (0, GRID_SIZE), (-GRID_SIZE, 0), (GRID_SIZE, 0)]:
-            neighbor_x = current[0] + neighbor[0]
-            neighbor_y = current[1] + neighbor[1]
-            neighbor_pos = (neighbor_x, neighbor_y)
-
-            if 0 <= neighbor_x < SCREEN_WIDTH and 0 <= neighbor_y < SCREEN_HEIGHT and neighbor_pos not in closed_list:
-                is_fire = any(f.x == neighbor_x and f.y == neighbor_y for f in fires)
-                fire_penalty = 10 if is_fire else 0
-                if avoid_fire and is_fire:
-                    continue
-
-                if neighbor_pos not in walls:
-                    tentative_g_score = g_score[current] + 1 + fire_penalty
-                    if neighbor_pos not in g_score or tentative_g_score < g_score[neighbor_pos]:
-                        came_from[neighbor_pos] = current
-                        g_score[neighbor_pos] = tentative_g_score
-                        f_score[neighbor_pos] = tentative_g_score + heuristic(neighbor_pos, goal) - nearest_fire_distance(neighbor_pos)
-                        heapq.heappush(open_list, (f_score[neighbor_pos], neighbor_pos))
-        
-    return []
-
-def calculate_astar(agent, game_map):
-    start = (agent.x, agent.y)
-    goal = (game_map.exit_door.x, game_map.exit_door.y)
-    
-    path = astar(start, goal, game_map.walls, game_map.fires, avoid_fire=True)
-    if not path:
-        path = astar(start, goal, game_map.walls, game_map.fires, avoid_fire=False)
-    return agent, path
-
-def game_loop():
+def game_loop(screen):
     map_file = "map.json"
-    game_map = Map(GRID_SIZE, SCREEN_WIDTH, SCREEN_HEIGHT, map_file)
-
-    num_agents = NUM_AGENTS
-    agents = []
-    for i in range(num_agents):
-        while True:
-            x = random.randint(0, game_map.cols - 1) * GRID_SIZE
-            y = random.randint(0, game_map.rows - 1) * GRID_SIZE
-            if (x, y) not in game_map.walls and (x, y) not in game_map.fire_positions:
-                agents.append(Agent(x, y, GRID_SIZE, 5, random.choice(AGENT_COLORS)))
+    try:
+        game_map = Map(GRID_SIZE, SCREEN_WIDTH, SCREEN_HEIGHT, map_file)
+    except ValueError as error:
+        print(f"Error: {error}")
+        sys.exit(1)
+    try:
+        sensors = SensorFeed(SENSOR_FEED) if SENSOR_FEED else None
+    except OSError as error:
+        print(f"Error: sensor feed {SENSOR_FEED}: {error}")
+        sys.exit(1)
+    simulation = Simulation(game_map, cooperative=COOPERATIVE_PLANNING, planning_budget_ms=PLANNING_BUDGET_MS,
+                            watch_map=WATCH_MAP_FILE, sensors=sensors)
+    simulation.agents = spawn_agents(game_map, NUM_AGENTS, simulation.random)
+    clock = SimulationClock(TICK_MS, SIMULATION_SPEED)
+
+    sink = trajectory.open_sink(TRAJECTORY_FILE) if TRAJECTORY_FILE else None
+    # Walls, fire, the exit, grid lines and agents go out in a single blit per frame
+    renderer = FrameRenderer(game_map)
+
+    def finish(tick):
+        # Runs on the simulation thread as each tick ends, before the next one starts
+        if sink:
+            sink.write(trajectory.tick_records(tick))
+        return renderer.snapshot(tick.agents)
+
+    # The next tick is computed while this one is drawn and the frame waits out its time
+    pipeline = TickPipeline(simulation, finish)
+    frame = renderer.snapshot(simulation.agents)
+    pipeline.advance()
+    watcher = simulation.map_watcher
+    reloads = 0
+
+    while pipeline.running:
+        for _ in clock.due_ticks():
+            frame = pipeline.advance()
+            if not pipeline.running:
                 break
 
-    fire_surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-    walls_surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-
-    for wall in game_map.walls:
-        pygame.draw.rect(walls_surface, RED, (wall[0], wall[1], GRID_SIZE, GRID_SIZE))
-
-    frame_count = 0
-
-    game_map.draw_background(screen)
-    game_map.draw_exit_door(screen)
-
-    while agents:
-        frame_count += 1
-        start_time = pygame.time.get_ticks()
-
-        if frame_count % 2 == 0:
-            game_map.spawn_new_fires()
-
-        screen.blit(walls_surface, (0, 0))
-
-        fire_surface.fill((0, 0, 0, 0))
-        game_map.draw_fires(fire_surface)
-        screen.blit(fire_surface, (0, 0))
-
-        game_map.draw_background_fence(screen)
-
-
-        with ThreadPoolExecutor() as executor:
-            future_to_agent = {executor.submit(calculate_astar, agent, game_map): agent for agent in agents}
-
-            for future in future_to_agent:
-                agent, path = future.result()
-                agent.path = path
-
-        if pygame.time.get_ticks() - start_time < 100:
-            pygame.time.wait(100)
-
-        for agent in agents[:]:
-            if game_map.exit_door.check_collision(agent):
-                agents.remove(agent)
-                continue
-            if agent.path:
-                next_step = agent.path[0]
-                if (next_step[0], next_step[1]) in game_map.fire_positions:
-                    agent.health -= 5
-                    if agent.health <= 0:
-                        agents.remove(agent)
-                        continue
-
-            agent.remove_draw(screen)
-            agent.move()
-            agent.draw(screen)
+        if watcher and watcher.reloads != reloads:
+            reloads = watcher.reloads
+            added, removed = watcher.last_change
+            if added or removed:
+                print(f"Reloaded {watcher.map_file}: {len(added)} walls added, {len(removed)} removed "
+                      f"in {watcher.last_reload_ms:.1f} ms")
 
+        renderer.draw_snapshot(screen, frame, clock.alpha)
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                pipeline.close()
+                if sink:
+                    sink.close()
                 pygame.quit()
                 sys.exit()
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_f:
+                    clock.set_speed((SIMULATION_SPEED or 1.0) if clock.fast_forward else None)
+                elif event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS) and not clock.fast_forward:
+                    clock.set_speed(clock.speed * 2)
+                elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS) and not clock.fast_forward:
+                    clock.set_speed(clock.speed / 2)
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 x, y = pygame.mouse.get_pos()
                 x = x // GRID_SIZE * GRID_SIZE
                 y = y // GRID_SIZE * GRID_SIZE
                 if event.button == 1:
-                    game_map.add_wall_at_position(x, y)
-                    pygame.draw.rect(walls_surface, RED, (x, y, GRID_SIZE, GRID_SIZE))
+                    pipeline.edit(game_map.add_wall_at_position, x, y)
                 elif event.button == 3:
-                    game_map.add_fire_at_position(x, y)
+                    pipeline.edit(game_map.add_fire_at_position, x, y)
 
         pygame.display.flip()
+        clock.wait_for_frame()
+
+    pipeline.close()
+    if sink:
+        sink.close()
+    print(f"Replans: {simulation.path_index.replans}  Avoided: {simulation.path_index.avoided}")
+    if sensors:
+        sensors.close()
+        print(f"Sensor events: {sensors.received} in {sensors.batches} batches, latency {sensors.latency_stats()}")
+
+def replay_loop(screen, path):
+    import numpy as np
+
+    try:
+        game_map = Map(GRID_SIZE, SCREEN_WIDTH, SCREEN_HEIGHT, "map.json")
+    except ValueError as error:
+        print(f"Error: {error}")
+        sys.exit(1)
+    store = trajectory.TrajectoryStore(path)
+    if not len(store):
+        print(f"{path} has no recorded ticks")
+        return
+    renderer = FrameRenderer(game_map)
+    colors = np.array(AGENT_COLORS, dtype=np.uint8)[np.arange(store.num_agents) % len(AGENT_COLORS)]
+    clock = SimulationClock(TICK_MS, SIMULATION_SPEED)
+    row = 0
+    playing = True
+
+    while True:
+        for _ in clock.due_ticks():
+            if playing:
+                row = min(row + 1, len(store) - 1)
+
+        fires = store.fires_until(store.ticks[row])
+        fire_mask = np.zeros((game_map.cols, game_map.rows), dtype=bool)
+        fire_mask[fires[:, 0] // GRID_SIZE, fires[:, 1] // GRID_SIZE] = True
+        frame = renderer.render_map(fire_mask)
+        states = store.states[row]
+        active = states['status'] == trajectory.STATUS_CODES['active']
+        position = np.stack([states['x'][active], states['y'][active]], axis=1)
+        renderer.draw_positions(frame, position, colors[active], GRID_SIZE)
+        # Progress bar along the bottom edge
+        frame[:SCREEN_WIDTH * (row + 1) // len(store), -3:] = BLUE
+        pygame.surfarray.blit_array(screen, frame)
+        pygame.display.set_caption(f"Replay: tick {store.ticks[row]} ({row + 1}/{len(store)})")
 
-game_loop()
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+            elif event.type == pygame.KEYDOWN:
+                step = {pygame.K_LEFT: -1, pygame.K_RIGHT: 1, pygame.K_PAGEUP: -100, pygame.K_PAGEDOWN: 100}
+                if event.key == pygame.K_SPACE:
+                    playing = not playing
+                elif event.key in step:
+                    row = max(0, min(row + step[event.key], len(store) - 1))
+            elif (event.type == pygame.MOUSEBUTTONDOWN and event.button == 1) or \
+                    (event.type == pygame.MOUSEMOTION and event.buttons[0]):
+                row = max(0, min(event.pos[0] * len(store) // SCREEN_WIDTH, len(store) - 1))
+
+        pygame.display.flip()
+        clock.wait_for_frame()
+
+def main():
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("AI Based Evacuation Simulation")
+    if REPLAY_FILE:
+        replay_loop(screen, REPLAY_FILE)
+    else:
+        game_loop(screen)
+
+if __name__ == "__main__":
+    main()
@@ -4,9 +4,6 @@ import json
 import heapq
 import random
 
-# Initialize Pygame
-pygame.init()
-
 # Screen dimensions
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
@@ -24,12 +21,9 @@ AGENT_COLORS = [(0, 128, 255), (0, 255, 128), (255, 0, 128), (128, 0, 255), (255
 # Grid settings
 GRID_SIZE = 20
 
-# Initialize screen
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("2D Game - Multiple Agents with Obstacles")
-
-# Clock to control frame rate
-clock = pygame.time.Clock()
+# Screen and frame-rate clock, created in main() once pygame is initialized
+screen = None
+clock = None
 
 class ExitDoor:
     def __init__(self, x, y, size):
@@ -265,4 +259,14 @@ def game_loop():
         pygame.display.flip()
         clock.tick(60)
 
-game_loop()
+def main():
+    global screen, clock
+    # Initialize Pygame
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("2D Game - Multiple Agents with Obstacles")
+    clock = pygame.time.Clock()
+    game_loop()
+
+if __name__ == "__main__":
+    main()
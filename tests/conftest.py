@@ -0,0 +1,43 @@
+import os
+import json
+import itertools
+
+import pytest
+
+from evacuation.simulation import GRID_SIZE, SCREEN_HEIGHT, SCREEN_WIDTH, Map
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def bundled_path():
+    # Path of a map shipped at the repository root, such as 'map.json'
+    return lambda name='map.json': os.path.join(ROOT, name)
+
+
+@pytest.fixture
+def bundled_map(bundled_path):
+    return lambda name='map.json': Map(GRID_SIZE, SCREEN_WIDTH, SCREEN_HEIGHT, bundled_path(name))
+
+
+@pytest.fixture
+def write_map(tmp_path):
+    # write_map(walls, exits, size): writes the layout to its own file under tmp_path and loads it;
+    # walls and exits are (x, y) pixel positions, size the (width, height) in pixels
+    names = itertools.count()
+
+    def write(walls=(), exits=(), size=(200, 100)):
+        map_file = tmp_path / f'map{next(names)}.json'
+        map_file.write_text(json.dumps({
+            'walls': [{'x': x, 'y': y} for x, y in walls],
+            'exits': [{'x': x, 'y': y} for x, y in exits],
+        }))
+        return Map(GRID_SIZE, size[0], size[1], str(map_file))
+
+    return write
+
+
+@pytest.fixture
+def split_map(write_map):
+    # 20 x 10 cells split by a full-height wall at x = 100, the only exit on the right
+    return write_map([(100, y) for y in range(0, 100, GRID_SIZE)], [(190, 90)])
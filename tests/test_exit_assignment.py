@@ -0,0 +1,30 @@
+import random
+
+from evacuation.exit_assignment import ExitAssigner
+from evacuation.simulation import spawn_agents
+
+# Eight exits round the edge of a 40 x 30 cell map with no walls
+EXITS = [(x, y) for x in (0, 200, 390) for y in (0, 150, 290) if (x, y) != (200, 150)]
+
+
+def test_resolve_after_departures_stays_cheap(write_map):
+    game_map = write_map(exits=EXITS, size=(400, 300))
+    agents = spawn_agents(game_map, 5000, random.Random(1))
+    assigner = ExitAssigner(game_map)
+    assigner.update(agents)
+    cold = assigner.bids
+
+    # 1% leave: the warm start re-seats the agents next to the freed slots, well under a cold
+    # solve, instead of a bidding war at the old prices (close to 900k bids before the fix)
+    agents = agents[:len(agents) * 99 // 100]
+    assigner.update(agents)
+    assert assigner.bids - cold < cold // 2
+    assert all(load <= capacity for load, capacity in zip(assigner.loads(), assigner.capacity))
+    assert all(agent.target_exit is not None for agent in agents)
+
+    # Half leave: a cold solve, which costs about one bid per agent
+    before = assigner.bids
+    agents = agents[:len(agents) // 2]
+    assigner.update(agents)
+    assert assigner.bids - before < 2 * cold
+    assert sum(assigner.loads()) <= len(agents)
@@ -0,0 +1,31 @@
+import random
+
+from evacuation.costs import ArrivalCost
+from evacuation.fire_arrival import fire_arrival_times, path_margin
+
+
+def test_fire_spreads_through_a_removed_wall(split_map):
+    game_map = split_map
+    game_map.add_fire_at_position(0, 0)
+    rng = random.Random(1)
+    for _ in range(50):
+        game_map.spawn_new_fires(1.0, rng)
+    assert (110, 0) not in game_map.fire_positions
+    # The burnt-out left half has retired from the front; opening the wall must put its edge back
+    assert not game_map.fire_positions.front
+
+    game_map.update_walls(set())
+    assert (110, 50) in fire_arrival_times(game_map, 1.0, 1)
+    for _ in range(50):
+        game_map.spawn_new_fires(1.0, rng)
+    assert (190, 90) in game_map.fire_positions
+
+
+def test_arrival_is_compared_in_ticks():
+    # The fire reaches the third cell at tick 5; an agent moving every other tick gets there at 6
+    path = [(10, 0), (20, 0), (30, 0)]
+    arrival = {(30, 0): 5}
+    assert path_margin(path, arrival) == 2
+    assert path_margin(path, arrival, ticks_per_move=2) == -1
+    assert ArrivalCost(arrival).cost((30, 0), 3) == 0
+    assert ArrivalCost(arrival, ticks_per_move=2).cost((30, 0), 3) > 0
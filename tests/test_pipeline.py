@@ -0,0 +1,38 @@
+from evacuation.pipeline import TickPipeline
+from evacuation.simulation import Simulation, spawn_agents
+from evacuation.trajectory import tick_records
+
+TICKS = 40
+# A wall dropped on a route between ticks 10 and 11, the way main.py queues mouse edits
+EDIT_TICK = 10
+WALL = (280, 290)
+
+
+def seeded_simulation(game_map):
+    game_map.add_fire_at_position(400, 300)
+    simulation = Simulation(game_map, seed=7)
+    simulation.agents = spawn_agents(game_map, 100, simulation.random)
+    return simulation
+
+
+def test_pipeline_matches_stepping_in_a_loop(bundled_map):
+    simulation = seeded_simulation(bundled_map())
+    looped = []
+    for number in range(1, TICKS + 1):
+        if number == EDIT_TICK + 1:
+            simulation.game_map.add_wall_at_position(*WALL)
+        looped.append(list(tick_records(simulation.step())))
+
+    simulation = seeded_simulation(bundled_map())
+    pipeline = TickPipeline(simulation, lambda tick: list(tick_records(tick)))
+    assert pipeline.advance() is None
+    piped = []
+    for number in range(1, TICKS + 1):
+        if number == EDIT_TICK:
+            pipeline.edit(simulation.game_map.add_wall_at_position, *WALL)
+        piped.append(pipeline.advance())
+    pipeline.close()
+    # The pipeline is a tick ahead when it is closed
+    assert simulation.tick == TICKS + 1
+    assert piped == looped
+    assert any(record['type'] == 'fire' for records in piped for record in records)
@@ -0,0 +1,149 @@
+import random
+from collections import deque
+
+import pytest
+
+from evacuation.costs import IMPASSABLE, EuclideanHeuristic, FieldHeuristic, ManhattanHeuristic
+from evacuation.exit_assignment import ExitDistanceFields
+from evacuation.paths import Path
+from evacuation.simulation import GRID_SIZE, SCREEN_HEIGHT, SCREEN_WIDTH, astar
+
+# map file: (start, expanded with Manhattan, expanded with the exit field, optimal path length).
+# The fire is the same on every map: (400, 300) spread 20 times at p=0.5 with Random(1).
+EXPANSIONS = {
+    'map.json': ((110, 140), 695, 133, 133),
+    'map1.json': ((110, 180), 152, 107, 107),
+    'map2.json': ((110, 250), 100, 100, 100),
+    'map3.json': ((110, 190), 131, 106, 106),
+}
+
+
+def burning_map(game_map):
+    game_map.add_fire_at_position(400, 300)
+    rng = random.Random(1)
+    for _ in range(20):
+        game_map.spawn_new_fires(0.5, rng)
+    return game_map
+
+
+def exit_field(game_map):
+    fields = ExitDistanceFields(game_map)
+    fields.refresh()
+    return fields.fields[0]
+
+
+def bfs_length(game_map, start, goal):
+    # Fewest moves around walls and fire, the reference the planner must match
+    seen = {start: 0}
+    queue = deque([start])
+    while queue:
+        x, y = queue.popleft()
+        if (x, y) == goal:
+            return seen[goal]
+        for dx, dy in [(0, -GRID_SIZE), (0, GRID_SIZE), (-GRID_SIZE, 0), (GRID_SIZE, 0)]:
+            neighbor = (x + dx, y + dy)
+            if neighbor in seen or not game_map.in_bounds(*neighbor):
+                continue
+            if neighbor in game_map.walls or neighbor in game_map.fire_positions:
+                continue
+            seen[neighbor] = seen[(x, y)] + 1
+            queue.append(neighbor)
+    return None
+
+
+def search(game_map, start, heuristic=None):
+    goal = (game_map.exit_door.x, game_map.exit_door.y)
+    stats = {}
+    path = astar(start, goal, game_map.walls, game_map.fire_positions, True, heuristic=heuristic, stats=stats)
+    return path, stats['expanded']
+
+
+@pytest.mark.parametrize('name', sorted(EXPANSIONS))
+def test_expansions_are_pinned(name, bundled_map):
+    start, manhattan, field, length = EXPANSIONS[name]
+    game_map = burning_map(bundled_map(name))
+
+    path, expanded = search(game_map, start)
+    assert (expanded, len(path)) == (manhattan, length)
+
+    path, expanded = search(game_map, start, FieldHeuristic(game_map, exit_field(game_map)))
+    assert (expanded, len(path)) == (field, length)
+
+
+@pytest.mark.parametrize('name', sorted(EXPANSIONS))
+def test_paths_are_optimal(name, bundled_map):
+    game_map = burning_map(bundled_map(name))
+    goal = (game_map.exit_door.x, game_map.exit_door.y)
+    heuristics = [None, EuclideanHeuristic(GRID_SIZE), FieldHeuristic(game_map, exit_field(game_map))]
+    free = sorted(
+        (x, y) for x in range(0, SCREEN_WIDTH, GRID_SIZE) for y in range(0, SCREEN_HEIGHT, GRID_SIZE)
+        if (x, y) not in game_map.walls and (x, y) not in game_map.fire_positions
+    )
+    for start in free[::97]:
+        length = bfs_length(game_map, start, goal)
+        for heuristic in heuristics:
+            path, _ = search(game_map, start, heuristic)
+            assert len(path) == (length or 0)
+            if path:
+                assert path[-1] == goal
+                steps = zip([start] + list(path), path)
+                assert all(abs(a[0] - b[0]) + abs(a[1] - b[1]) == GRID_SIZE for a, b in steps)
+
+
+@pytest.mark.parametrize('name', sorted(EXPANSIONS))
+def test_heuristics_are_admissible(name, bundled_map):
+    game_map = burning_map(bundled_map(name))
+    field = exit_field(game_map)
+    goal = (game_map.exit_door.x, game_map.exit_door.y)
+    manhattan = ManhattanHeuristic(GRID_SIZE)
+    exact = FieldHeuristic(game_map, field)
+    for x in range(0, SCREEN_WIDTH, GRID_SIZE):
+        for y in range(0, SCREEN_HEIGHT, GRID_SIZE):
+            if (x, y) in game_map.walls:
+                continue
+            distance = exact((x, y), goal)
+            if distance == IMPASSABLE:
+                continue
+            assert manhattan((x, y), goal) <= distance
+            # Consistent: one move never lowers the estimate by more than its cost of 1
+            for dx, dy in [(0, GRID_SIZE), (GRID_SIZE, 0)]:
+                neighbor = (x + dx, y + dy)
+                if game_map.in_bounds(*neighbor) and neighbor not in game_map.walls:
+                    assert abs(exact((x, y), goal) - exact(neighbor, goal)) <= 1
+                    assert abs(manhattan((x, y), goal) - manhattan(neighbor, goal)) <= 1
+
+
+def test_fire_is_avoided_or_priced():
+    # Three rows with a detour round one burning cell, then a fire line across the whole corridor
+    start, goal = (0, 0), (50, 0)
+    size = (60, 30)
+    path = astar(start, goal, set(), {(20, 0)}, True, GRID_SIZE, *size)
+    assert len(path) == 7 and (20, 0) not in path
+    path = astar(start, goal, set(), {(20, 0)}, False, GRID_SIZE, *size)
+    assert len(path) == 7 and (20, 0) not in path
+
+    line = {(20, 0), (20, 10), (20, 20)}
+    assert astar(start, goal, set(), line, True, GRID_SIZE, *size) == []
+    path = astar(start, goal, set(), line, False, GRID_SIZE, *size)
+    assert len(path) == 5 and (20, 0) in path
+
+
+def test_path_steps_through_cells():
+    path = Path.from_positions([(10, 0), (10, 10), (20, 10)], 6, GRID_SIZE)
+    assert list(path) == [(10, 0), (10, 10), (20, 10)] and path == [(10, 0), (10, 10), (20, 10)]
+    assert path.popleft() == (10, 0)
+    assert len(path) == 2 and path[0] == (10, 10) and path[-1] == (20, 10) and path.next_cell() == 7
+    assert path[:1] == [(10, 10)] and path[5:] == []
+    path.popleft()
+    path.popleft()
+    assert not path and list(path) == []
+    with pytest.raises(IndexError):
+        path.popleft()
+
+
+def test_no_route_is_an_empty_path():
+    line = {(20, 0), (20, 10), (20, 20)}
+    path = astar((0, 0), (50, 0), line, set(), True, GRID_SIZE, 60, 30)
+    assert isinstance(path, Path) and not path and path == []
+    with pytest.raises(IndexError):
+        path.popleft()
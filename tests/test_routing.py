@@ -0,0 +1,16 @@
+from evacuation.routing import UNREACHABLE, RoutingTable, cell_index
+
+EXITS = [(0, 0), (190, 90)]
+
+
+def test_walled_exit_matches_incremental_table(write_map):
+    game_map = write_map(exits=EXITS)
+    table = RoutingTable.build(game_map)
+    game_map.wall_listeners.append(table)
+    game_map.add_wall_at_position(0, 0)
+
+    rebuilt = RoutingTable.build(write_map([(0, 0)], EXITS))
+    assert list(rebuilt.distance) == list(table.distance)
+    assert list(rebuilt.exit_id) == list(table.exit_id)
+    assert rebuilt.distance[cell_index(game_map, 0, 0)] == UNREACHABLE
+    assert rebuilt.route(10, 0)[-1] == (190, 90)
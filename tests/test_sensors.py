@@ -0,0 +1,64 @@
+import random
+import socket
+
+import pytest
+
+from evacuation.sensors import SensorFeed, parse_event
+from evacuation.simulation import Simulation, spawn_agents
+
+
+def feed_of(events):
+    feed = SensorFeed(events)
+    feed.thread.join()
+    return feed
+
+
+def test_events_are_parsed():
+    assert parse_event('{"x": 300, "y": 200, "time": 5}') == (300, 200, 5)
+    assert parse_event('300 200') == (300, 200, None)
+    assert parse_event('300') is None and parse_event('') is None
+
+
+def test_batch_is_ignited_in_one_tick(bundled_map):
+    game_map = bundled_map()
+    feed = feed_of([(400, 300), (405, 305), '410 300', 'garbage'])
+    simulation = Simulation(game_map, seed=1, sensors=feed)
+    simulation.agents = spawn_agents(game_map, 10, random.Random(1))
+    tick = simulation.step()
+    assert sorted((fire.x, fire.y) for fire in tick.new_fires) == [(400, 300), (410, 300)]
+    assert (feed.received, feed.ignited, feed.rejected, feed.batches) == (3, 2, 1, 1)
+    assert feed.latency_stats()['events'] == 3
+
+
+def test_latency_waits_for_deferred_replans(bundled_map):
+    # A zero budget plans one agent per tick, so the routes are only all in place some ticks later
+    game_map = bundled_map()
+    feed = feed_of([(400, 300)])
+    simulation = Simulation(game_map, seed=1, planning_budget_ms=0, sensors=feed)
+    simulation.agents = spawn_agents(game_map, 5, random.Random(1))
+    simulation.step()
+    assert len(simulation.scheduler) and feed.latency_stats() is None
+    while len(simulation.scheduler):
+        simulation.step()
+    assert feed.latency_stats()['events'] == 1
+
+
+def test_unusable_source_fails_in_the_caller(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        SensorFeed(str(tmp_path / 'missing.log'))
+    with socket.socket() as listener:
+        listener.bind(('127.0.0.1', 0))
+        port = listener.getsockname()[1]
+    with pytest.raises(ConnectionRefusedError):
+        SensorFeed(f'tcp://127.0.0.1:{port}')
+
+
+def test_read_error_is_raised_from_apply(bundled_map):
+    def broken():
+        yield '300 200'
+        raise ConnectionResetError("gateway went away")
+
+    game_map = bundled_map()
+    feed = feed_of(broken())
+    with pytest.raises(ConnectionResetError):
+        feed.apply(game_map)
@@ -0,0 +1,74 @@
+import asyncio
+import json
+
+import pytest
+
+from evacuation.service import SimulationService, encode
+
+
+async def exchange(requests):
+    service = SimulationService()
+    server = await asyncio.start_server(service.handle_client, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    replies = []
+    for request in requests:
+        writer.write((json.dumps(request) + '\n').encode())
+        await writer.drain()
+        replies.append(json.loads(await reader.readline()))
+    for name in list(service.sessions):
+        service.close(name)
+    writer.close()
+    server.close()
+    return replies
+
+
+def test_bad_map_is_rejected_without_stopping_the_service(tmp_path, bundled_path):
+    broken = tmp_path / 'broken.json'
+    broken.write_text('{"walls": [')
+    replies = asyncio.run(exchange([
+        {'op': 'create', 'session': 'a', 'map': str(tmp_path / 'missing.json'), 'agents': 1},
+        {'op': 'create', 'session': 'b', 'map': str(broken), 'agents': 1},
+        {'op': 'create', 'session': 'c', 'map': bundled_path(), 'agents': 1, 'speed': None},
+        {'op': 'list'},
+    ]))
+    assert [reply['ok'] for reply in replies] == [False, False, True, True]
+    assert 'not found' in replies[0]['error'] and 'Invalid JSON' in replies[1]['error']
+    assert list(replies[3]['sessions']) == ['c']
+
+
+async def watch(session_options, break_step=False):
+    # Creates a session, subscribes and returns every message up to the one that ends the stream
+    service = SimulationService()
+    server = await asyncio.start_server(service.handle_client, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(encode(dict(session_options, op='create', session='a')))
+    assert json.loads(await reader.readline())['ok']
+    if break_step:
+        def step():
+            raise RuntimeError("step failed")
+        service.sessions['a'].simulation.step = step
+    writer.write(encode({'op': 'subscribe', 'session': 'a'}))
+    messages = []
+    while not messages or messages[-1].get('type') not in ('finished', 'error'):
+        messages.append(json.loads(await asyncio.wait_for(reader.readline(), 60)))
+    if break_step:
+        with pytest.raises(RuntimeError):
+            await service.sessions['a'].task
+    writer.close()
+    server.close()
+    return messages
+
+
+def test_session_finishes_with_trapped_agents(bundled_path):
+    # Some of the agents on map.json spawn in rooms with no way out
+    messages = asyncio.run(watch({'map': bundled_path(), 'agents': 200, 'seed': 42, 'speed': None}))
+    finished = messages[-1]
+    assert finished['type'] == 'finished' and finished['trapped'] > 0
+    assert finished['saved'] + finished['lost'] + finished['trapped'] == 200
+
+
+def test_failed_step_is_reported(bundled_path):
+    messages = asyncio.run(watch({'map': bundled_path(), 'agents': 1, 'seed': 1}, True))
+    assert messages[-1]['type'] == 'error' and 'step failed' in messages[-1]['error']
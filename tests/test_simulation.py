@@ -0,0 +1,23 @@
+from evacuation.simulation import GRID_SIZE, Agent, Simulation
+from evacuation.tiles import TiledSimulation
+
+
+def both_sides():
+    # One agent left of the wall, walled in, and one on the exit's side
+    return [Agent(x, 50, GRID_SIZE, 5, (0, 0, 0), agent_id=i) for i, x in enumerate((20, 150))]
+
+
+def test_run_ends_when_the_rest_are_trapped(split_map):
+    simulation = Simulation(split_map, seed=1)
+    simulation.agents = both_sides()
+
+    ticks = list(simulation.run())
+    assert len(ticks) < 100 and simulation.saved == 1
+    assert [agent.id for agent in simulation.trapped()] == [0]
+
+
+def test_tiled_run_skips_trapped_agents(split_map):
+    with TiledSimulation(split_map, both_sides(), (2, 1), seed=1) as simulation:
+        ticks = list(simulation.run())
+    assert len(ticks) < 100 and simulation.saved == 1
+    assert [agent.id for agent in simulation.trapped()] == [0]
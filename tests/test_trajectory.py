@@ -0,0 +1,58 @@
+import pytest
+
+from evacuation.simulation import Simulation, spawn_agents
+from evacuation.trajectory import STATUS_CODES, StoreSink, TrajectoryStore, tick_records
+
+
+def test_store_round_trip(tmp_path, bundled_map):
+    game_map = bundled_map()
+    game_map.add_fire_at_position(400, 300)
+    simulation = Simulation(game_map, seed=1)
+    simulation.agents = spawn_agents(game_map, 20, simulation.random)
+    # Records are taken as each tick ends, like a sink sees them
+    ticks = [list(tick_records(tick)) for tick in simulation.run(30)]
+    path = str(tmp_path / 'x.traj')
+    sink = StoreSink(path)
+    for records in ticks:
+        sink.write(records)
+    sink.close()
+
+    store = TrajectoryStore(path)
+    assert len(store) == 30 and store.num_agents == 20
+    fires = []
+    for number, records in enumerate(ticks, 1):
+        row = store.snapshot(number)
+        for record in records:
+            if record['type'] == 'fire':
+                fires.append((record['x'], record['y']))
+                continue
+            state = row[record['id']]
+            assert (state['x'], state['y'], state['status']) == (record['x'], record['y'],
+                                                                 STATUS_CODES[record['status']])
+            assert state['health'] == pytest.approx(record['health'])
+        assert [tuple(cell) for cell in store.fires_until(number)] == fires
+
+    track = store.track(3)
+    assert len(track) == 30 and (track[-1]['x'], track[-1]['y']) == tuple(store.snapshot(30)[3][['x', 'y']])
+
+
+def test_store_resolves_missing_ticks(tmp_path):
+    path = str(tmp_path / 'x.traj')
+    sink = StoreSink(path)
+    sink.write([
+        {'type': 'agent', 'tick': 2, 'id': 0, 'x': 10, 'y': 20, 'health': 100, 'status': 'active'},
+        {'type': 'fire', 'tick': 2, 'id': None, 'x': 400, 'y': 300, 'health': None, 'status': 'burning'},
+        {'type': 'agent', 'tick': 5, 'id': 0, 'x': 30, 'y': 20, 'health': 90, 'status': 'exited'},
+        {'type': 'fire', 'tick': 5, 'id': None, 'x': 410, 'y': 300, 'health': None, 'status': 'burning'},
+    ])
+    sink.close()
+
+    store = TrajectoryStore(path)
+    assert list(store.ticks) == [2, 5]
+    # Ticks 3 and 4 were not recorded and read as tick 2; anything after the last reads as tick 5
+    assert store.snapshot(4)[0]['x'] == 10 and store.snapshot(9)[0]['x'] == 30
+    assert store.fires_until(4).tolist() == [[400, 300]]
+    assert store.fires_until(5).tolist() == [[400, 300], [410, 300]]
+    assert list(store.track(0)['status']) == [STATUS_CODES['active'], STATUS_CODES['exited']]
+    with pytest.raises(KeyError):
+        store.snapshot(1)